@@ -0,0 +1,376 @@
+"""
+Benchmark the translation middleware against a local mock of Google Translation.
+
+Each mode runs a synthetic spider in its own process, next to a fresh mock server process, and reports items/sec,
+translation requests per item, p50/p99 item latency (from the moment the spider yields an item to the moment it
+reaches the pipelines) and peak memory:
+
+    python benchmarks/bench.py --items 2000 --languages 4 --reuse 0.5 --latency 0.05
+    python benchmarks/bench.py --modes sequential,batching --json results.json
+
+With --baseline, the results are compared to the ones of a former run saved with --json, with the same options:
+a mode is slower, sends more requests or uses more memory than its baseline allows when it's off by more than its
+TOLERANCES.
+
+The exit status is 1 if a mode lost items or fell behind its baseline.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from scrapy_auto_trans.spidermiddlewares.autotrans import SyncAutoTranslationMiddleware  # noqa: E402
+
+LANGUAGES = ('zh-CN', 'fr', 'ja', 'de', 'es', 'ru', 'ko', 'vi', 'it', 'pt')
+
+# settings of each middleware mode
+MODES = {
+    'sequential': {},
+    'concurrent': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+    },
+    'dispatcher': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_MAX_PENDING_REQUESTS': 16,
+    },
+    'batching': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_BATCHING': True,
+    },
+    'batching-window': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_BATCHING': True,
+        'AUTO_TRANSLATION_BATCH_WINDOW': 0.05,
+    },
+    'cache': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_CACHE_SIZE': 100000,
+    },
+    'segmentation': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_BATCHING': True,
+        'AUTO_TRANSLATION_CACHE_SIZE': 100000,
+        'AUTO_TRANSLATION_SEGMENTATION': True,
+    },
+    'spool': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_SPOOL_RETRY_DELAY': 0,
+    },
+    'routed': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_BATCHING': True,
+        'AUTO_TRANSLATION_HEDGE_MIN_SAMPLES': 5,
+    },
+    'sync': {},
+    'executor-thread': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_EXECUTOR': 'thread',
+        'AUTO_TRANSLATION_EXECUTOR_WORKERS': 16,
+    },
+    'executor-process': {
+        'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+        'AUTO_TRANSLATION_EXECUTOR': 'process',
+        'AUTO_TRANSLATION_EXECUTOR_WORKERS': 4,
+    },
+}
+
+# middleware of the modes that don't use GoogleAutoTranslationMiddleware
+MODE_MIDDLEWARES = {
+    'routed': 'routed',
+    'sync': 'sync',
+    'executor-thread': 'sync',
+    'executor-process': 'sync',
+}
+
+# lowest error rate of the mock server in each mode
+MODE_ERROR_RATES = {
+    'spool': 0.05,
+}
+
+# by result: whether it must stay above ('min') or below ('max') its baseline, and by how much it may be off
+TOLERANCES = {
+    'items_per_sec': ('min', 0.5),
+    'requests_per_item': ('max', 0.1),
+    'p99_item_latency_ms': ('max', 1.0),
+    'peak_memory_mb': ('max', 0.5),
+}
+
+# options that must be the same as the baseline's
+COMPARED_OPTIONS = (
+    'items', 'items_per_page', 'languages', 'sentences', 'reuse', 'latency', 'error_rate', 'concurrency',
+)
+
+SENTENCES = (
+    'The city lies on the banks of a wide river.',
+    'It is known for its old harbour and its markets.',
+    'Winters are mild and summers are long and dry.',
+    'The local economy relies on trade, tourism and services.',
+    'Several universities attract students from all over the country.',
+    'Its historic centre is listed as a world heritage site.',
+)
+
+
+class BenchSyncTranslationMiddleware(SyncAutoTranslationMiddleware):
+    """
+    Translates each text with a blocking call to the mock server, like a synchronous client library would. Defined
+    at module level so that the process pool can build it in its workers.
+    """
+
+    def language_translate(self, source_lang_code, target_lang_code, text):
+        query = urlencode({'key': 'benchmark', 'source': source_lang_code, 'target': target_lang_code, 'q': text})
+        with urlopen('%s?%s'%(self.settings.get('BENCH_TRANSLATE_URL'), query)) as response:
+            body = json.loads(response.read().decode('utf8'))
+        return body['data']['translations'][0]['translatedText']
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def start_mock_server(args, mode):
+    """
+    Starts the mock server in its own process, so that it doesn't compete with the crawl for the GIL
+    """
+    error_rate = max(args.error_rate, MODE_ERROR_RATES.get(mode, 0))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, 'mock_server.py'), '--port', '0',
+         '--latency', str(args.latency), '--error-rate', str(error_rate)],
+        stdout=subprocess.PIPE,
+    )
+    # Serving http://127.0.0.1:<port>/language/translate/v2
+    translate_url = server.stdout.readline().decode('utf8').split()[-1]
+    return server, translate_url
+
+
+def run_mode(mode, args):
+    """
+    Runs the benchmark spider in this process and returns its results
+    """
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+    from scrapy_auto_trans.spidermiddlewares.autotrans import GoogleAutoTranslationMiddleware
+    from mock_server import TRANSLATE_PATH
+
+    server_url = args.mock_url[:-len(TRANSLATE_PATH)]
+
+    class BenchTranslationMiddleware(GoogleAutoTranslationMiddleware):
+        TRANSLATE_URL = args.mock_url
+
+    fields = {
+        'name': scrapy.Field(),
+        'background': scrapy.Field(),
+        'created': scrapy.Field(),
+    }
+    for language in LANGUAGES[:args.languages]:
+        suffix = language.split('-')[0].lower()
+        fields['name_%s'%suffix] = scrapy.Field(auto_translate=True, source='name', language=language)
+        fields['background_%s'%suffix] = scrapy.Field(auto_translate=True, source='background', language=language)
+    BenchItem = type('BenchItem', (scrapy.Item,), fields)
+
+    distinct_texts = max(1, int(round(args.items * (1 - args.reuse))))
+    latencies = []
+
+    class BenchSpider(scrapy.Spider):
+        name = 'bench'
+
+        def start_requests(self):
+            pages = (args.items + args.items_per_page - 1) // args.items_per_page
+            for page in range(pages):
+                yield scrapy.Request('%s/page/%d'%(server_url, page), cb_kwargs={'page': page})
+
+        def parse(self, response, page):
+            first = page * args.items_per_page
+            for n in range(first, min(first + args.items_per_page, args.items)):
+                text_id = n % distinct_texts
+                yield BenchItem(
+                    name='City %d'%text_id,
+                    background=' '.join(
+                        SENTENCES[(text_id + i) % len(SENTENCES)] for i in range(args.sentences)
+                    ) + ' Population %d.'%text_id,
+                    created=time.monotonic(),
+                )
+
+    class LatencyPipeline:
+        def process_item(self, item, spider):
+            latencies.append(time.monotonic() - item['created'])
+            return item
+
+    sys.modules[__name__].BenchTranslationMiddleware = BenchTranslationMiddleware
+    sys.modules[__name__].LatencyPipeline = LatencyPipeline
+    middleware = {
+        'google': 'BenchTranslationMiddleware',
+        'sync': 'BenchSyncTranslationMiddleware',
+        'routed': 'scrapy_auto_trans.spidermiddlewares.autotrans.RoutedAutoTranslationMiddleware',
+    }[MODE_MIDDLEWARES.get(mode, 'google')]
+    if '.' not in middleware:
+        middleware = '%s.%s'%(__name__, middleware)
+    settings = {
+        'LOG_LEVEL': 'ERROR',
+        'ROBOTSTXT_OBEY': False,
+        'TELNETCONSOLE_ENABLED': False,
+        'GOOGLE_CLOUD_API_KEY': 'benchmark',
+        'BENCH_TRANSLATE_URL': args.mock_url,
+        # two backends on the same mock server: requests are hedged and fail over between them
+        'AUTO_TRANSLATION_BACKENDS': {
+            name: {'class': 'scrapy_auto_trans.backends.GoogleTranslationBackend', 'url': args.mock_url}
+            for name in ('primary', 'secondary')
+        },
+        'CONCURRENT_REQUESTS': args.concurrency,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': args.concurrency,
+        'SPIDER_MIDDLEWARES': {middleware: 701},
+        'ITEM_PIPELINES': {'%s.LatencyPipeline'%__name__: 300},
+    }
+    settings.update(MODES[mode])
+    spool_dir = tempfile.TemporaryDirectory()
+    if mode=='spool':
+        settings['AUTO_TRANSLATION_SPOOL_PATH'] = os.path.join(spool_dir.name, 'bench.spool')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(BenchSpider)
+    process.crawl(crawler)
+    started = time.monotonic()
+    process.start()
+    elapsed = time.monotonic() - started
+    spool_dir.cleanup()
+
+    server_stats = json.loads(urlopen(server_url + '/stats').read().decode('utf8'))
+    items = len(latencies)
+    return {
+        'mode': mode,
+        'options': {option: getattr(args, option) for option in COMPARED_OPTIONS},
+        'items': items,
+        'expected_items': args.items,
+        'seconds': round(elapsed, 3),
+        'items_per_sec': round(items / elapsed, 1) if elapsed else None,
+        'requests': server_stats['requests'],
+        'requests_per_item': round(server_stats['requests'] / float(items), 3) if items else None,
+        'texts_per_request': (
+            round(server_stats['texts'] / float(server_stats['requests']), 2) if server_stats['requests'] else None
+        ),
+        'characters': server_stats['characters'],
+        'errors': server_stats['errors'],
+        'p50_item_latency_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p99_item_latency_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        # kilobytes on Linux
+        'peak_memory_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+COLUMNS = (
+    ('mode', '%-16s'),
+    ('items', '%7s'),
+    ('items_per_sec', '%10s'),
+    ('requests_per_item', '%9s'),
+    ('texts_per_request', '%9s'),
+    ('p50_item_latency_ms', '%9s'),
+    ('p99_item_latency_ms', '%9s'),
+    ('peak_memory_mb', '%8s'),
+)
+HEADERS = ('mode', 'items', 'items/s', 'req/item', 'texts/req', 'p50 ms', 'p99 ms', 'peak MB')
+
+
+def print_table(results):
+    print(' '.join(fmt%header for (_, fmt), header in zip(COLUMNS, HEADERS)))
+    for result in results:
+        print(' '.join(fmt%result.get(column) for column, fmt in COLUMNS))
+
+
+def compare_to_baseline(results, baseline):
+    """
+    Returns the results that fell behind their baseline, as messages
+    """
+    baseline_results = {result['mode']: result for result in baseline}
+    regressions = []
+    for result in results:
+        expected = baseline_results.get(result['mode'])
+        if expected is None:
+            print('No baseline for mode %s'%result['mode'])
+            continue
+        if expected.get('options')!=result['options']:
+            regressions.append('%s: the baseline was run with other options: %s'%(result['mode'], expected.get('options')))
+            continue
+        for name, (direction, tolerance) in TOLERANCES.items():
+            value, reference = result.get(name), expected.get(name)
+            if value is None or reference is None:
+                continue
+            if direction=='min' and value<reference * (1 - tolerance):
+                regressions.append('%s: %s is %s, below %s - %d%%'%(
+                    result['mode'], name, value, reference, tolerance * 100
+                ))
+            elif direction=='max' and value>reference * (1 + tolerance):
+                regressions.append('%s: %s is %s, above %s + %d%%'%(
+                    result['mode'], name, value, reference, tolerance * 100
+                ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES), help='comma separated, among: %s'%', '.join(MODES))
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--items-per-page', type=int, default=20)
+    parser.add_argument('--languages', type=int, default=2, help='target languages, two fields each')
+    parser.add_argument('--sentences', type=int, default=3, help='sentences of the background field')
+    parser.add_argument('--reuse', type=float, default=0.5, help='share of items repeating the text of another')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per translation request')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=16, help='CONCURRENT_REQUESTS')
+    parser.add_argument('--json', help='write the results into this file')
+    parser.add_argument('--baseline', help='compare the results to the ones of this file, written by --json')
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    parser.add_argument('--mock-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.languages = max(1, min(args.languages, len(LANGUAGES)))
+
+    if args.run_mode:
+        # child process: a Twisted reactor can only be started once
+        print(json.dumps(run_mode(args.run_mode, args)))
+        return 0
+
+    results = []
+    for mode in args.modes.split(','):
+        if mode not in MODES:
+            parser.error("unknown mode '%s'"%mode)
+        server, translate_url = start_mock_server(args, mode)
+        try:
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--run-mode', mode, '--mock-url', translate_url]
+                + sys.argv[1:],
+                cwd=BENCHMARKS_DIR,
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        results.append(json.loads(output.decode('utf8').strip().splitlines()[-1]))
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    status = 0
+    lost = [result['mode'] for result in results if result['items']!=result['expected_items']]
+    if lost:
+        print('Items were lost in mode(s): %s'%', '.join(lost))
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f))
+        for regression in regressions:
+            print('Regression: %s'%regression)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+A local stand-in for the Google Cloud Translation v2 endpoint.
+
+Accepts GET requests with "q" parameters in the query string and POST requests with a JSON body, and translates
+every text into "[<target>] <text>". Also serves HTML pages under /page/ for the benchmark spider, and its
+request counters as JSON under /stats.
+
+    python benchmarks/mock_server.py --port 8765 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+TRANSLATE_PATH = '/language/translate/v2'
+
+
+class MockTranslationServer:
+    """
+    Answers translation requests after `latency` seconds; a share `error_rate` of them fails with a 500
+    """
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.texts = 0
+        self.characters = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    @property
+    def translate_url(self):
+        return 'http://127.0.0.1:%d%s'%(self.port, TRANSLATE_PATH)
+
+    @property
+    def page_url(self):
+        return 'http://127.0.0.1:%d/page/'%self.port
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='mock-translation-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'texts': self.texts,
+            'characters': self.characters,
+            'errors': self.errors,
+        }
+
+    def translate(self, params):
+        """
+        Returns the status and the body of the response
+        """
+        texts = params.get('q', [])
+        if isinstance(texts, str):
+            texts = [texts]
+        target = params.get('target')
+        if isinstance(target, list):
+            target = target[0]
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+            self.characters += sum(len(text) for text in texts)
+            failed = self.error_rate and self.random.random()<self.error_rate
+            if failed:
+                self.errors += 1
+        if failed:
+            return 500, {'error': {'code': 500, 'message': 'Backend Error'}}
+        return 200, {'data': {'translations': [
+            {'translatedText': '[%s] %s'%(target, text)} for text in texts
+        ]}}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.startswith('/page/'):
+                    self._send(200, b'<html><body>page</body></html>', 'text/html')
+                elif url.path=='/stats':
+                    self._send_json(200, server.stats())
+                elif url.path==TRANSLATE_PATH:
+                    self._send_json(*server.translate(parse_qs(url.query)))
+                else:
+                    self._send(404, b'', 'text/plain')
+
+            def do_POST(self):
+                if urlparse(self.path).path!=TRANSLATE_PATH:
+                    self._send(404, b'', 'text/plain')
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                self._send_json(*server.translate(json.loads(self.rfile.read(length) or b'{}')))
+
+            def _send_json(self, status, body):
+                self._send(status, json.dumps(body).encode('utf8'), 'application/json')
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765, help='0 for any free port')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per translation request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 500')
+    args = parser.parse_args()
+    server = MockTranslationServer(args.port, args.latency, args.error_rate)
+    print('Serving %s'%server.translate_url, flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -36,7 +36,7 @@ class CityItem(scrapy.Item):
     background_vi = scrapy.Field(auto_translate=True, source='background', language='vi')
 
     # other types of derived information
-    total_area_in_sq_miles = scrapy.Field(auto_translate=True, translate=tr.sqkm2sqmiles, source='total_area')
+    total_area_in_sq_miles = scrapy.Field(auto_translate=True, translate=tr.sqkm2sqmiles, source='total_area', incremental=True)
     current_local_time = scrapy.Field(auto_translate=True, translate=tr.get_time, source='time_zone')
     gdp_in_cny = scrapy.Field(auto_translate=True, translate=tr.usd2foreign('CNY'), source='gdp')
     gdp_in_eur = scrapy.Field(auto_translate=True, translate=tr.usd2foreign('EUR'), source='gdp')
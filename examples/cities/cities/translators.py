@@ -8,8 +8,8 @@ as the paremeters, and to return the translated value or another (request, callb
 
 from pytz import timezone
 from datetime import datetime
-import scrapy
 import re
+from scrapy_auto_trans.reference import ReferenceData, uses_reference
 
 def sqkm2sqmiles(field_name, item, **kwargs):
     """
@@ -28,19 +28,25 @@ def get_time(field_name, item, **kwargs):
     tz = timezone(tz_name)
     return datetime.now(tz=tz).strftime('%Y-%m-%d %H:%M:%S')
 
-def usd2foreign(currency):
-    def _usd(field_name, item, **kwargs):
-        def callback(response, _field_name, _item, **cb_kwargs):
-            rate_str = response.xpath("//td[re:test(a/@href,'.*%s$')]/a/text()"%currency).get()
-            _source_field_name = cb_kwargs['source']
-            _source_value_raw = _item[_source_field_name]
-            value_str, unit = re.match(' *[^0-9]*([0-9\.]+) +([a-z]+) *', _source_value_raw).groups()[0:2]
-            trans_value = int(float(value_str)*float(rate_str))
-            return '{} {:,} {}'.format(currency, trans_value, unit)
+def parse_usd_rates(response):
+    """
+    {currency: rate} of the USD exchange rates table
+    """
+    rates = {}
+    for link in response.xpath("//td/a[re:test(@href, 'to=[A-Z]+$')]"):
+        currency = link.attrib['href'].rsplit('=', 1)[-1]
+        rates.setdefault(currency, float(link.xpath('text()').get().replace(',', '')))
+    return rates
 
-        return scrapy.Request(
-            url = 'https://www.x-rates.com/table/?from=USD&amount=1',
-            dont_filter=True,
-        ), callback
+# fetched once an hour for all the currency fields of all the items
+USD_RATES = ReferenceData('https://www.x-rates.com/table/?from=USD&amount=1', parse_usd_rates, ttl=3600)
+
+def usd2foreign(currency):
+    @uses_reference(USD_RATES)
+    def _usd(field_name, item, reference, **kwargs):
+        _source_value_raw = item[kwargs['source']]
+        value_str, unit = re.match(' *[^0-9]*([0-9\.]+) +([a-z]+) *', _source_value_raw).groups()[0:2]
+        trans_value = int(float(value_str)*reference[currency])
+        return '{} {:,} {}'.format(currency, trans_value, unit)
 
     return _usd
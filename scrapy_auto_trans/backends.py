@@ -0,0 +1,200 @@
+"""
+Translation services: how to ask each of them to translate a list of texts, and how to read their answers
+"""
+import json
+from urllib.parse import quote as urlquote, unquote as urlunquote
+import scrapy
+from . import exceptions as excs
+from .dispatch import CHARACTERS_META_KEY
+
+GOOGLE_TRANSLATE_URL = 'https://translation.googleapis.com/language/translate/v2'
+
+
+def google_translate_url(url, api_key, source_lang_code, target_lang_code, texts):
+    """
+    The v2 API accepts many "q" parameters and translates them in one go
+    """
+    quoted_texts = '&'.join('q={}'.format(urlquote(text.encode('utf8'))) for text in texts)
+    return \
+        '{url}?key={key}' \
+        '&{quoted_texts}' \
+        '&target={target_lang_code}' \
+        '&source={source_lang_code}'.format(
+            url=url,
+            key=api_key,
+            quoted_texts=quoted_texts,
+            target_lang_code=target_lang_code,
+            source_lang_code=source_lang_code
+        )
+
+
+def google_translate_post_request(url, api_key, source_lang_code, target_lang_code, texts):
+    """
+    The same request as google_translate_url(), with the texts in a JSON body and the API key in a header
+    """
+    return scrapy.Request(
+        url = url,
+        method = 'POST',
+        body = json.dumps({'q': list(texts), 'target': target_lang_code, 'source': source_lang_code}),
+        headers = {'Content-Type': 'application/json', 'X-Goog-Api-Key': api_key},
+        meta = {CHARACTERS_META_KEY: sum(len(text) for text in texts)},
+    )
+
+
+def google_translate_results(response):
+    translations = json.loads(response.text)['data']['translations']
+    return [urlunquote(translation['translatedText']) for translation in translations]
+
+
+class TranslationBackend:
+    """
+    A translation service. name is the key of the backend in AUTO_TRANSLATION_BACKENDS and options the other
+    keys of its entry; options that aren't given are looked up in the settings.
+    """
+
+    def __init__(self, name, settings, **options):
+        self.name = name
+        self.settings = settings
+        self.options = options
+
+    def __repr__(self):
+        return '<%s %s>'%(self.__class__.__name__, self.name)
+
+    def get_option(self, name, setting=None, default=None):
+        value = self.options.get(name)
+        if value is None and setting is not None:
+            value = self.settings.get(setting)
+        return default if value is None else value
+
+    def get_language_code(self, language_code, source=False):
+        """
+        The code the service uses for a language, see the language_codes option
+        """
+        return self.get_option('language_codes', default={}).get(language_code, language_code)
+
+    def get_request(self, source_lang_code, target_lang_code, texts):
+        """
+        Returns the request that translates the texts
+        """
+        raise NotImplementedError
+
+    def get_results(self, response, texts):
+        """
+        Returns the list of translations, in the same order as texts
+        """
+        raise NotImplementedError
+
+    def make_request(self, url, texts, **kwargs):
+        meta = kwargs.pop('meta', {})
+        meta[CHARACTERS_META_KEY] = sum(len(text) for text in texts)
+        return scrapy.Request(url, meta=meta, **kwargs)
+
+    def check_results(self, results, texts):
+        if len(results)!=len(texts):
+            raise excs.TranslationErrorGeneral(
+                "%s returned %d translations for %d texts"%(self.name, len(results), len(texts))
+            )
+        return results
+
+
+class GoogleTranslationBackend(TranslationBackend):
+    """
+    Google Cloud Translation v2. Options: api_key (GOOGLE_CLOUD_API_KEY by default), url and post_threshold
+    (GOOGLE_TRANSLATION_POST_THRESHOLD by default), see GoogleAutoTranslationMiddleware.
+    """
+
+    def get_api_key(self):
+        key = self.get_option('api_key', 'GOOGLE_CLOUD_API_KEY')
+        if not key:
+            raise excs.TranslationErrorGeneral(
+                "A Google Cloud API Key must be available for the translation backend '%s'"%self.name
+            )
+        return key
+
+    def get_request(self, source_lang_code, target_lang_code, texts):
+        url = self.get_option('url', default=GOOGLE_TRANSLATE_URL)
+        source_lang_code = self.get_language_code(source_lang_code, source=True)
+        target_lang_code = self.get_language_code(target_lang_code)
+        get_url = google_translate_url(url, self.get_api_key(), source_lang_code, target_lang_code, texts)
+        threshold = int(self.get_option('post_threshold', 'GOOGLE_TRANSLATION_POST_THRESHOLD', 2000))
+        if threshold and len(get_url)<=threshold:
+            return self.make_request(get_url, texts)
+        return google_translate_post_request(url, self.get_api_key(), source_lang_code, target_lang_code, texts)
+
+    def get_results(self, response, texts):
+        return self.check_results(google_translate_results(response), texts)
+
+
+class DeepLTranslationBackend(TranslationBackend):
+    """
+    DeepL API v2. Options: api_key (DEEPL_API_KEY by default), url (the free API by default)
+    """
+
+    DEFAULT_URL = 'https://api-free.deepl.com/v2/translate'
+    TARGET_LANGUAGE_CODES = {
+        'zh-CN': 'ZH-HANS',
+        'zh-TW': 'ZH-HANT',
+        'en': 'EN-US',
+        'pt': 'PT-PT',
+    }
+
+    def get_language_code(self, language_code, source=False):
+        language_codes = self.get_option('language_codes', default={})
+        if language_code in language_codes:
+            return language_codes[language_code]
+        if source:
+            # source languages never have a variant
+            return language_code.split('-')[0].upper()
+        return self.TARGET_LANGUAGE_CODES.get(language_code, language_code.upper())
+
+    def get_request(self, source_lang_code, target_lang_code, texts):
+        api_key = self.get_option('api_key', 'DEEPL_API_KEY')
+        if not api_key:
+            raise excs.TranslationErrorGeneral(
+                "A DeepL API Key must be available for the translation backend '%s'"%self.name
+            )
+        return self.make_request(
+            self.get_option('url', default=self.DEFAULT_URL),
+            texts,
+            method = 'POST',
+            body = json.dumps({
+                'text': list(texts),
+                'source_lang': self.get_language_code(source_lang_code, source=True),
+                'target_lang': self.get_language_code(target_lang_code),
+            }),
+            headers = {'Content-Type': 'application/json', 'Authorization': 'DeepL-Auth-Key %s'%api_key},
+        )
+
+    def get_results(self, response, texts):
+        translations = json.loads(response.text)['translations']
+        return self.check_results([translation['text'] for translation in translations], texts)
+
+
+class LibreTranslateBackend(TranslationBackend):
+    """
+    LibreTranslate, usually self-hosted. Options: url (required), api_key (optional)
+    """
+
+    def get_language_code(self, language_code, source=False):
+        language_codes = self.get_option('language_codes', default={})
+        return language_codes.get(language_code, language_code.split('-')[0].lower())
+
+    def get_request(self, source_lang_code, target_lang_code, texts):
+        url = self.get_option('url')
+        if not url:
+            raise excs.TranslationErrorGeneral("The translation backend '%s' needs a url"%self.name)
+        body = {
+            'q': list(texts),
+            'source': self.get_language_code(source_lang_code, source=True),
+            'target': self.get_language_code(target_lang_code),
+            'format': 'text',
+        }
+        api_key = self.get_option('api_key')
+        if api_key:
+            body['api_key'] = api_key
+        return self.make_request(
+            url, texts, method='POST', body=json.dumps(body), headers={'Content-Type': 'application/json'},
+        )
+
+    def get_results(self, response, texts):
+        return self.check_results(json.loads(response.text)['translatedText'], texts)
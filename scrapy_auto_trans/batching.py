@@ -0,0 +1,113 @@
+"""
+Group the texts of the same language pair into batched translation requests
+"""
+from twisted.internet import defer
+from . import exceptions as excs
+
+
+class TranslationBatch:
+    """
+    Texts waiting to be translated from one language to another in a single request.
+    Identical texts are only sent once, each of their waiters gets the same result.
+    """
+
+    def __init__(self, source_lang_code, target_lang_code):
+        self.source_lang_code = source_lang_code
+        self.target_lang_code = target_lang_code
+        self.texts = []
+        self.size_in_chars = 0
+        self.waiters = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, text):
+        d = defer.Deferred()
+        if text in self.waiters:
+            self.waiters[text].append(d)
+        else:
+            self.texts.append(text)
+            self.size_in_chars += len(text)
+            self.waiters[text] = [d]
+        return d
+
+    def resolve(self, results):
+        """
+        Hands the translations, in the same order as the texts, out to the waiters
+        """
+        if len(results)!=len(self.texts):
+            self.fail(excs.TranslationErrorGeneral(
+                "%d translations received for a batch of %d texts"%(len(results), len(self.texts))
+            ))
+            return
+        waiters, self.waiters = self.waiters, {}
+        for text, result in zip(self.texts, results):
+            for d in waiters[text]:
+                d.callback(result)
+
+    def fail(self, error):
+        waiters, self.waiters = self.waiters, {}
+        for deferreds in waiters.values():
+            for d in deferreds:
+                d.errback(error)
+
+
+class TranslationBatcher:
+    """
+    Collects the texts into batches keyed by (source language, target language).
+    A batch is closed when it reaches max_texts or max_chars. With a window (in seconds), open batches
+    are also closed by a timer so that the texts of many items can share one request; on_timeout
+    receives the batches closed this way.
+    """
+
+    def __init__(self, max_texts, max_chars=None, window=0, on_timeout=None):
+        self.max_texts = max_texts
+        self.max_chars = max_chars
+        self.window = window
+        self.on_timeout = on_timeout
+        self.open_batches = {}
+        self.closed_batches = []
+        self._timer = None
+
+    def add(self, source_lang_code, target_lang_code, text):
+        key = (source_lang_code, target_lang_code)
+        batch = self.open_batches.get(key)
+        if (
+            batch is not None
+            and text not in batch.waiters
+            and self.max_chars
+            and batch.size_in_chars + len(text) > self.max_chars
+        ):
+            self.closed_batches.append(self.open_batches.pop(key))
+            batch = None
+        if batch is None:
+            batch = self.open_batches[key] = TranslationBatch(source_lang_code, target_lang_code)
+        d = batch.add(text)
+        if len(batch)>=self.max_texts:
+            self.closed_batches.append(self.open_batches.pop(key))
+        if self.window and self.open_batches and self._timer is None:
+            from twisted.internet import reactor
+            self._timer = reactor.callLater(self.window, self._timeout)
+        return d
+
+    def pop_batches(self, include_open=False):
+        """
+        Returns the closed batches, and the open ones as well if include_open is True
+        """
+        batches, self.closed_batches = self.closed_batches, []
+        if include_open:
+            batches.extend(self.open_batches.values())
+            self.open_batches = {}
+            if self._timer is not None and self._timer.active():
+                self._timer.cancel()
+            self._timer = None
+        return batches
+
+    def has_batches(self):
+        return bool(self.open_batches or self.closed_batches)
+
+    def _timeout(self):
+        self._timer = None
+        batches = self.pop_batches(include_open=True)
+        if batches and self.on_timeout is not None:
+            self.on_timeout(batches)
@@ -0,0 +1,241 @@
+"""
+Caches of translated texts, keyed by (source language, target language, text)
+"""
+from collections import OrderedDict
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LRUTranslationCache:
+    """
+    In-memory cache that evicts the least recently used translations.
+    The cache holds at most max_entries translations and, if max_chars is given, at most max_chars characters
+    of source and translated text. With a ttl (in seconds), translations older than ttl are treated as misses.
+    """
+
+    def __init__(self, max_entries, max_chars=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self.size_in_chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """
+        Returns the cached translation, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at<=time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (value, expires_at)
+        self.size_in_chars += self._size_of(key, value)
+        while self._entries and (
+            len(self._entries)>self.max_entries
+            or (self.max_chars and self.size_in_chars>self.max_chars)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size_in_chars = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+        }
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self.size_in_chars -= self._size_of(key, value)
+
+    @staticmethod
+    def _size_of(key, value):
+        return len(key[-1]) + (len(value) if isinstance(value, str) else 0)
+
+
+class SqliteWriter:
+    """
+    A SQLite file written by a background thread. The rows handed to _queue() are buffered, then committed by
+    write_rows() every flush_interval seconds or as soon as flush_size rows are waiting, so the reactor thread
+    never waits for the disk. _open() opens the file in WAL mode, creates the table with SCHEMA and starts the
+    writer thread.
+    """
+
+    SCHEMA = None
+    THREAD_NAME = 'auto-translation-sqlite'
+    # what the rows are, in the error messages
+    ROWS_NAME = 'rows'
+
+    def __init__(self, path, flush_interval=1.0, flush_size=500, timeout=30.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._conn = None
+        self._writer = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _open(self):
+        if self._conn is None:
+            self._conn = self._connect()
+            self._conn.execute(self.SCHEMA)
+            self._conn.commit()
+            self._writer = threading.Thread(target=self._write_loop, name=self.THREAD_NAME, daemon=True)
+            self._writer.start()
+        return self._conn
+
+    def _get_pending(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    def _queue(self, key, row):
+        with self._lock:
+            self._pending[key] = row
+            pending_count = len(self._pending)
+        if pending_count>=self.flush_size:
+            self._wakeup.set()
+
+    def close(self):
+        """
+        Writes the pending rows and stops the writer thread
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._conn is None:
+            return
+        self._wakeup.set()
+        self._writer.join()
+        self._conn.close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+        }
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self._flush(conn)
+                if self._closed:
+                    self._flush(conn)
+                    break
+        finally:
+            conn.close()
+
+    def _flush(self, conn):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with conn:
+                self.write_rows(conn, pending)
+        except sqlite3.Error as e:
+            logger.error("Unable to write %d %s into '%s': %s", len(pending), self.ROWS_NAME, self.path, e)
+        else:
+            self.writes += len(pending)
+
+    def write_rows(self, conn, rows):
+        """
+        Writes the {key: row} rows, in the writer thread
+        """
+        raise NotImplementedError
+
+
+class SqliteTranslationStore(SqliteWriter):
+    """
+    Translations persisted in a SQLite file, so that they survive the crawl and can be shared by the crawls
+    running on the same host. The database is opened in WAL mode: readers never wait for writers and several
+    processes may open the same file at once.
+    Writes are buffered and committed by a background thread, see SqliteWriter.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS translations ('
+        'source TEXT NOT NULL, target TEXT NOT NULL, text TEXT NOT NULL, translation TEXT NOT NULL, '
+        'updated REAL NOT NULL, PRIMARY KEY (source, target, text))'
+    )
+    THREAD_NAME = 'auto-translation-store'
+    ROWS_NAME = 'translations'
+
+    def __init__(self, path, flush_interval=1.0, flush_size=500, timeout=30.0):
+        super(SqliteTranslationStore, self).__init__(
+            path, flush_interval=flush_interval, flush_size=flush_size, timeout=timeout
+        )
+        self._open()
+
+    def get(self, key):
+        """
+        Returns the stored translation, or None if there's none
+        """
+        value = self._get_pending(key)
+        if value is None:
+            row = self._conn.execute(
+                'SELECT translation FROM translations WHERE source=? AND target=? AND text=?', key
+            ).fetchone()
+            value = row[0] if row else None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._queue(key, value)
+
+    def write_rows(self, conn, rows):
+        now = time.time()
+        conn.executemany(
+            'INSERT OR REPLACE INTO translations (source, target, text, translation, updated) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [key + (value, now) for key, value in rows.items()]
+        )
@@ -0,0 +1,237 @@
+"""
+A translation cache shared by the nodes of a cluster, kept in Redis
+"""
+from collections import OrderedDict
+import logging
+import os
+import socket
+import time
+import uuid
+from twisted.internet import defer, threads
+from .fingerprints import digest
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterTranslationCache:
+    """
+    Looks translations up in Redis and publishes the new ones, so that the nodes crawling with the same url
+    translate each text once between them. Needs the redis package.
+
+    get() returns a Deferred. The keys looked up during a reactor turn, e.g. the fields of an item, are sent
+    together: one MGET, plus one pipeline of leases for the misses. A miss fires with None after taking a lease
+    of lease_ttl seconds on the key: this node translates the text, then publishes it with set(), or gives the
+    lease up with release(). When another node holds the lease, the key is looked up again every poll_interval
+    seconds until its translation shows up or the lease expires.
+
+    Redis errors make the cache unavailable for retry_after seconds: lookups fire with None and nothing is
+    published, the nodes translate on their own meanwhile.
+    """
+
+    def __init__(self, url, ttl=None, lease_ttl=30.0, poll_interval=0.2, max_connections=10, timeout=1.0,
+                 retry_after=30.0, key_prefix='auto_translation:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The cluster translation cache needs the redis package: pip install redis")
+        self.client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(
+            url, max_connections=max_connections, socket_timeout=timeout, socket_connect_timeout=timeout,
+        ))
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self.key_prefix = key_prefix
+        self.node_id = '%s:%d:%s'%(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self.unavailable_until = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.published = 0
+        self.errors = 0
+        # Deferreds of the keys to look up in the next round trip, by key
+        self._queued = OrderedDict()
+        # Deferreds of the keys leased by another node, looked up again on the next poll
+        self._polling = {}
+        # translations to publish (None to give the lease up) in the next round trip, by key
+        self._publishes = {}
+        # expiry times of the leases held by this node, by key
+        self._leases = {}
+        self._inflight = 0
+        self._flush_call = None
+        self._poll_call = None
+
+    def __len__(self):
+        return sum(len(ds) for ds in self._queued.values()) + sum(len(ds) for ds in self._polling.values()) \
+            + self._inflight
+
+    def is_available(self):
+        return self.unavailable_until<=time.monotonic()
+
+    def value_key(self, key):
+        return self.key_prefix + 't:' + digest(*key).hex()
+
+    def lease_key(self, key):
+        return self.key_prefix + 'l:' + digest(*key).hex()
+
+    def get(self, key):
+        """
+        Returns a Deferred firing with the translation of the (source language, target language, text) key,
+        or with None when this node has to translate it
+        """
+        d = defer.Deferred()
+        if not self.is_available():
+            d.callback(None)
+        elif key in self._leases or key in self._polling:
+            # this node or another one is translating the text already
+            self._polling.setdefault(key, []).append(d)
+            self._schedule_poll()
+        else:
+            self._queued.setdefault(key, []).append(d)
+            self._schedule_flush()
+        return d
+
+    def set(self, key, translation):
+        self._leases.pop(key, None)
+        if self.is_available():
+            self._publishes[key] = translation
+            self._schedule_flush()
+
+    def release(self, key):
+        """
+        Gives up the lease taken on a key whose translation failed, another node may translate it then
+        """
+        if key in self._leases:
+            self.set(key, None)
+
+    def _schedule_flush(self):
+        if self._flush_call is None:
+            from twisted.internet import reactor
+            self._flush_call = reactor.callLater(0, self.flush)
+
+    def _schedule_poll(self):
+        if self._poll_call is None:
+            from twisted.internet import reactor
+            self._poll_call = reactor.callLater(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_call = None
+        polling, self._polling = self._polling, {}
+        now = time.monotonic()
+        for key, ds in polling.items():
+            if self._leases.get(key, 0)>now:
+                # still translated by this node
+                self._polling.setdefault(key, []).extend(ds)
+                continue
+            # the lease of this node, if any, has expired
+            self._leases.pop(key, None)
+            if not self.is_available():
+                for d in ds:
+                    d.callback(None)
+            else:
+                self._queued.setdefault(key, []).extend(ds)
+        if self._polling:
+            self._schedule_poll()
+        if self._queued:
+            self.flush()
+
+    def flush(self):
+        """
+        Sends the queued publications and lookups in a thread of the reactor's pool
+        """
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        self._flush_call = None
+        lookups, self._queued = self._queued, OrderedDict()
+        publishes, self._publishes = self._publishes, {}
+        if not lookups and not publishes:
+            return
+        self._inflight += sum(len(ds) for ds in lookups.values())
+        self.published += len([translation for translation in publishes.values() if translation is not None])
+        d = threads.deferToThread(self._round_trip, list(lookups), publishes)
+        d.addCallbacks(
+            self._looked_up, self._round_trip_failed, callbackArgs=(lookups,), errbackArgs=(lookups,),
+        )
+
+    def _round_trip(self, keys, publishes):
+        if publishes:
+            ex = int(self.ttl) if self.ttl else None
+            pipeline = self.client.pipeline(transaction=False)
+            for key, translation in publishes.items():
+                if translation is not None:
+                    pipeline.set(self.value_key(key), translation.encode('utf8'), ex=ex)
+                pipeline.delete(self.lease_key(key))
+            pipeline.execute()
+        if not keys:
+            return [], {}
+        values = self.client.mget([self.value_key(key) for key in keys])
+        misses = [key for key, value in zip(keys, values) if value is None]
+        leases = {}
+        if misses:
+            pipeline = self.client.pipeline(transaction=False)
+            for key in misses:
+                pipeline.set(self.lease_key(key), self.node_id, nx=True, px=int(self.lease_ttl * 1000))
+            leases = dict(zip(misses, pipeline.execute()))
+        return values, leases
+
+    def _looked_up(self, result, lookups):
+        values, leases = result
+        self._inflight -= sum(len(ds) for ds in lookups.values())
+        for (key, ds), value in zip(lookups.items(), values):
+            if value is not None:
+                self.hits += len(ds)
+                translation = value.decode('utf8')
+                for d in ds:
+                    d.callback(translation)
+            elif leases.get(key):
+                self.misses += 1
+                self._leases[key] = time.monotonic() + self.lease_ttl
+                ds[0].callback(None)
+                if ds[1:]:
+                    self._polling.setdefault(key, []).extend(ds[1:])
+                    self._schedule_poll()
+            else:
+                self.waits += len(ds)
+                self._polling.setdefault(key, []).extend(ds)
+                self._schedule_poll()
+
+    def _round_trip_failed(self, failure, lookups):
+        self._inflight -= sum(len(ds) for ds in lookups.values())
+        self.errors += 1
+        if self.is_available():
+            logger.warning(
+                "The cluster translation cache is unreachable, translating locally for %gs: %s",
+                self.retry_after, failure.getErrorMessage(),
+            )
+        self.unavailable_until = time.monotonic() + self.retry_after
+        self._leases.clear()
+        for ds in lookups.values():
+            for d in ds:
+                d.callback(None)
+
+    def close(self):
+        """
+        Publishes what's left, synchronously, and closes the connections
+        """
+        if self._flush_call is not None and self._flush_call.active():
+            self._flush_call.cancel()
+        if self._poll_call is not None and self._poll_call.active():
+            self._poll_call.cancel()
+        publishes, self._publishes = self._publishes, {}
+        for key in self._leases:
+            publishes.setdefault(key, None)
+        if publishes and self.is_available():
+            try:
+                self._round_trip([], publishes)
+            except Exception as e:
+                logger.warning("Unable to publish the last translations to the cluster cache: %s", e)
+        self.client.connection_pool.disconnect()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'waits': self.waits,
+            'published': self.published,
+            'errors': self.errors,
+        }
@@ -0,0 +1,134 @@
+"""
+Translate the items of a JSON lines export after the crawl:
+
+    scrapy translate cities.jl --item cities.items.CityItem -O cities_translated.jl
+"""
+import json
+import logging
+import scrapy
+from scrapy.commands import BaseRunSpiderCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.misc import load_object
+
+logger = logging.getLogger(__name__)
+
+# settings of the translation run, unless the project or the command line sets them
+DEFAULT_SETTINGS = {
+    'AUTO_TRANSLATION_CONCURRENT_FIELDS': True,
+    'AUTO_TRANSLATION_BATCHING': True,
+    'AUTO_TRANSLATION_BATCH_WINDOW': 1.0,
+    'AUTO_TRANSLATION_CACHE_SIZE': 100000,
+    'AUTO_TRANSLATION_MAX_INFLIGHT_ITEMS': 10000,
+}
+
+
+class ExportTranslationSpider(scrapy.Spider):
+    """
+    Reads the records of a JSON lines file, chunk_size records per output request, and yields them as items of
+    item_cls for the translation middleware. Keys that aren't fields of item_cls are kept.
+    """
+    name = 'translate_export'
+    custom_settings = {'ROBOTSTXT_OBEY': False}
+
+    def __init__(self, path, item_cls, chunk_size=1000, **kwargs):
+        super(ExportTranslationSpider, self).__init__(**kwargs)
+        self.path = path
+        self.item_cls = item_cls
+        self.chunk_size = int(chunk_size)
+        # subclasses of item_cls with the extra keys of the records as fields, by extra keys
+        self._item_classes = {}
+
+    def start_requests(self):
+        # the file is read as the engine asks for requests, so that it's never loaded at once
+        for records in self.read_chunks():
+            yield scrapy.Request(
+                'data:,', callback=self.parse_records, dont_filter=True, cb_kwargs={'records': records},
+            )
+
+    def read_chunks(self):
+        records = []
+        with open(self.path, encoding='utf8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    logger.error("Skipping line %d of %s: %s", line_number, self.path, e)
+                    continue
+                if len(records)>=self.chunk_size:
+                    yield records
+                    records = []
+        if records:
+            yield records
+
+    def parse_records(self, response, records):
+        for record in records:
+            yield self.get_item_class(record)(record)
+
+    def get_item_class(self, record):
+        extra_keys = frozenset(record).difference(self.item_cls.fields)
+        if not extra_keys:
+            return self.item_cls
+        item_cls = self._item_classes.get(extra_keys)
+        if item_cls is None:
+            fields = {key: scrapy.Field() for key in extra_keys}
+            item_cls = self._item_classes[extra_keys] = type(self.item_cls.__name__, (self.item_cls,), fields)
+        return item_cls
+
+
+class Command(BaseRunSpiderCommand):
+    """
+    scrapy translate <file.jl> --item <Item class> -o <output>: the records go through the translation middleware
+    of the project (AUTO_TRANSLATION_ENABLED is forced on) and are written to the feeds given by -o/-O.
+    Fields that are already filled in are left as they are. The project's item pipelines aren't run.
+    """
+    requires_project = False
+    default_settings = {'SPIDER_LOADER_WARN_ONLY': True}
+
+    def syntax(self):
+        return "[options] <file.jl>"
+
+    def short_desc(self):
+        return "Translate the items of a JSON lines export"
+
+    def long_desc(self):
+        return (
+            "Translate the items of a JSON lines export with the project's translation middleware, "
+            "and write them to the feeds given with -o/-O"
+        )
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument(
+            "--item", metavar="CLASS", help="import path of the Item class of the records (required)",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000, help="records read at once (default: %(default)s)",
+        )
+
+    def process_options(self, args, opts):
+        super(Command, self).process_options(args, opts)
+        self.settings.set('AUTO_TRANSLATION_ENABLED', True, priority='cmdline')
+        # the project's settings would override the command's defaults
+        self.settings.set('ITEM_PIPELINES', {}, priority='cmdline')
+        for name, value in DEFAULT_SETTINGS.items():
+            self.settings.setdefault(name, value)
+
+    def run(self, args, opts):
+        if len(args)!=1:
+            raise UsageError()
+        if not opts.item:
+            raise UsageError("The Item class of the records must be given with --item")
+        try:
+            item_cls = load_object(opts.item)
+        except (ImportError, NameError, ValueError) as e:
+            raise UsageError("Unable to load the Item class %r: %s"%(opts.item, e))
+        if not (isinstance(item_cls, type) and issubclass(item_cls, scrapy.Item)):
+            raise UsageError("%r is not an Item class"%opts.item)
+        self.crawler_process.crawl(
+            ExportTranslationSpider, path=args[0], item_cls=item_cls, chunk_size=opts.chunk_size, **opts.spargs
+        )
+        self.crawler_process.start()
+        if self.crawler_process.bootstrap_failed:
+            self.exitcode = 1
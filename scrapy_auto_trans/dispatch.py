@@ -0,0 +1,240 @@
+"""
+Send translation requests straight to the downloader
+"""
+from collections import defaultdict, deque
+from email.utils import parsedate_to_datetime
+import logging
+import time
+from scrapy.downloadermiddlewares.retry import get_retry_request
+from scrapy.http import Response
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.misc import load_object
+
+logger = logging.getLogger(__name__)
+
+CHARACTERS_META_KEY = 'auto_translation_characters'
+RETRIES_META_KEY = 'auto_translation_rate_limit_retries'
+# whether the dispatcher retries the request on download errors and RETRY_HTTP_CODES responses
+RETRY_META_KEY = 'auto_translation_retry'
+
+
+class TokenBucket:
+    """
+    Holds up to capacity tokens, refilled at rate tokens per second
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, factor=1.0):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * factor)
+        self.updated = now
+
+    def delay(self, amount, factor=1.0):
+        """
+        Seconds to wait before amount tokens are available
+        """
+        self.refill(factor)
+        amount = min(amount, self.capacity)
+        if self.tokens>=amount:
+            return 0
+        return (amount - self.tokens) / (self.rate * factor)
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class BackendRateLimit:
+    """
+    Rate limit of a translation backend: at most `requests` requests and `characters` characters every `period`
+    seconds (either limit may be None). When the backend answers 429 Too Many Requests, the rates are halved and
+    nothing is sent until its Retry-After delay is over; each successful response then brings the rates back up.
+    """
+
+    MIN_FACTOR = 1 / 16.0
+
+    def __init__(self, requests=None, characters=None, period=1.0):
+        self.request_bucket = TokenBucket(requests / float(period), requests) if requests else None
+        self.character_bucket = TokenBucket(characters / float(period), characters) if characters else None
+        self.factor = 1.0
+        self.hold_until = 0
+
+    def delay(self, characters):
+        delays = [self.hold_until - time.monotonic()]
+        if self.request_bucket is not None:
+            delays.append(self.request_bucket.delay(1, self.factor))
+        if self.character_bucket is not None and characters:
+            delays.append(self.character_bucket.delay(characters, self.factor))
+        return max(0, max(delays))
+
+    def consume(self, characters):
+        if self.request_bucket is not None:
+            self.request_bucket.consume(1)
+        if self.character_bucket is not None and characters:
+            self.character_bucket.consume(characters)
+
+    def throttle(self, retry_after):
+        self.factor = max(self.MIN_FACTOR, self.factor / 2)
+        self.hold_until = max(self.hold_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        if self.factor<1.0:
+            self.factor = min(1.0, self.factor * 1.1)
+
+
+class TranslationDispatcher:
+    """
+    Downloads translation requests with engine.download(), so they don't go through the scheduler and keep
+    flowing while the engine is paused. Each backend gets its own download slot, so that throttling translations
+    never slows the pages down. A backend is identified by the request's host.
+    At most max_pending_requests requests per backend are downloaded at the same time (0 for no limit) and
+    rate_limits, a dict of BackendRateLimit options by host ('*' for any other host), tells how fast they may be
+    sent;
+    the other requests wait in a queue. Requests answered with 429 Too Many Requests are sent again, up to
+    max_retries times, once the backend is ready. RetryMiddleware would send them again at once, ignoring
+    Retry-After: it is turned off for the dispatched requests, which are retried by the dispatcher instead, with
+    the RETRY_* settings.
+    The result of each download, a Response or a Failure, is handed to on_result(result, request).
+    """
+
+    THROTTLE_HTTP_CODES = (429, 503)
+
+    def __init__(self, crawler, on_result, max_pending_requests=0, rate_limits=None, max_retries=5):
+        self.crawler = crawler
+        self.on_result = on_result
+        self.max_pending_requests = max_pending_requests
+        self.rate_limit_options = dict(rate_limits or {})
+        self.rate_limits = {}
+        self.max_retries = max_retries
+        settings = crawler.settings
+        self.retry_enabled = settings.getbool('RETRY_ENABLED')
+        self.retry_http_codes = set(int(code) for code in settings.getlist('RETRY_HTTP_CODES'))
+        self.retry_exceptions = tuple(
+            load_object(exception) if isinstance(exception, str) else exception
+            for exception in settings.getlist('RETRY_EXCEPTIONS')
+        )
+        self.queues = defaultdict(deque)
+        self.pending = defaultdict(int)
+        self._timers = {}
+
+    def get_backend(self, request):
+        return urlparse_cached(request).netloc
+
+    def get_rate_limit(self, backend):
+        rate_limit = self.rate_limits.get(backend)
+        if rate_limit is None:
+            options = self.rate_limit_options.get(backend, self.rate_limit_options.get('*', {}))
+            rate_limit = self.rate_limits[backend] = BackendRateLimit(**options)
+        return rate_limit
+
+    def send(self, request, first=False):
+        backend = self.get_backend(request)
+        request.meta.setdefault('download_slot', 'auto_translation:%s'%backend)
+        if RETRY_META_KEY not in request.meta:
+            request.meta[RETRY_META_KEY] = self.retry_enabled and not request.meta.get('dont_retry', False)
+            request.meta['dont_retry'] = True
+        if first:
+            self.queues[backend].appendleft(request)
+        else:
+            self.queues[backend].append(request)
+        self._process_queue(backend)
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values()) + sum(self.pending.values())
+
+    def _process_queue(self, backend):
+        self._timers.pop(backend, None)
+        queue = self.queues[backend]
+        rate_limit = self.get_rate_limit(backend)
+        while queue and (not self.max_pending_requests or self.pending[backend]<self.max_pending_requests):
+            request = queue[0]
+            characters = request.meta.get(CHARACTERS_META_KEY, 0)
+            delay = rate_limit.delay(characters)
+            if delay>0:
+                if backend not in self._timers:
+                    from twisted.internet import reactor
+                    self._timers[backend] = reactor.callLater(delay, self._process_queue, backend)
+                break
+            rate_limit.consume(characters)
+            queue.popleft()
+            self.pending[backend] += 1
+            d = self.crawler.engine.download(request)
+            d.addBoth(self._downloaded, request, backend)
+
+    def _downloaded(self, result, request, backend):
+        self.pending[backend] -= 1
+        try:
+            if isinstance(result, Response) and self.is_throttled(result):
+                if self._throttled(result, backend):
+                    return
+            elif isinstance(result, Response) and result.status<300:
+                self.get_rate_limit(backend).recover()
+            elif self._retry(result, request):
+                return
+            self.on_result(result, request)
+        finally:
+            self._process_queue(backend)
+
+    def is_throttled(self, response):
+        """
+        429 Too Many Requests, or 503 with a Retry-After header; other 503 responses are plain errors
+        """
+        if response.status not in self.THROTTLE_HTTP_CODES:
+            return False
+        return response.status==429 or self.get_retry_after(response) is not None
+
+    def _throttled(self, response, backend):
+        """
+        Slows the backend down, returns True if the request is sent again
+        """
+        retry_after = self.get_retry_after(response)
+        retries = response.request.meta.get(RETRIES_META_KEY, 0)
+        self.get_rate_limit(backend).throttle(retry_after if retry_after is not None else 2 ** retries)
+        self.crawler.stats.inc_value('auto_translation/throttled/%s'%backend)
+        if retries>=self.max_retries:
+            return False
+        request = response.request.replace()
+        request.meta[RETRIES_META_KEY] = retries + 1
+        request.dont_filter = True
+        logger.debug("Translation backend %s is throttled, %s will be sent again", backend, request)
+        self.send(request, first=True)
+        return True
+
+    def _retry(self, result, request):
+        """
+        Sends a request that failed with a download error or a RETRY_HTTP_CODES response again, like
+        RetryMiddleware would, returns True if it is sent again
+        """
+        if not request.meta.get(RETRY_META_KEY):
+            return False
+        if isinstance(result, Response):
+            if result.status not in self.retry_http_codes:
+                return False
+            reason = 'response code %d'%result.status
+        elif self.retry_exceptions and result.check(*self.retry_exceptions):
+            reason = result.value
+        else:
+            return False
+        retry_request = get_retry_request(request, spider=self.crawler.spider, reason=reason)
+        if retry_request is None:
+            return False
+        self.send(retry_request)
+        return True
+
+    def get_retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.decode('latin1').strip()
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,103 @@
+"""
+Run synchronous translators outside of the reactor thread
+"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import logging
+import pickle
+from scrapy.settings import Settings
+from twisted.internet import defer
+
+logger = logging.getLogger(__name__)
+
+# middleware instances of a worker process, by middleware class
+_worker_middlewares = {}
+
+
+def _worker_language_translate(mw_cls, settings, source_lang_code, target_lang_code, text):
+    """
+    Called in a worker process, where each middleware class is instantiated once
+    """
+    mw = _worker_middlewares.get(mw_cls)
+    if mw is None:
+        mw = _worker_middlewares[mw_cls] = mw_cls(Settings(settings))
+    return mw.language_translate(source_lang_code, target_lang_code, text)
+
+
+class TranslationExecutor:
+    """
+    Runs synchronous translators in a pool of threads ('thread') or processes ('process') and returns Deferreds
+    that are fired in the reactor thread. on_done() is called in the reactor thread after each of them is fired.
+    In a process pool the translators, their arguments and their results must be picklable; language_translate()
+    is called on an instance of the middleware built in the worker process from worker_settings. See can_submit()
+    for the translators that can't be pickled.
+    """
+
+    POOLS = {
+        'thread': ThreadPoolExecutor,
+        'process': ProcessPoolExecutor,
+    }
+
+    def __init__(self, kind, max_workers=None, worker_settings=None, on_done=None):
+        if kind not in self.POOLS:
+            raise ValueError("unknown translation executor '%s', expected one of: %s"%(
+                kind, ', '.join(sorted(self.POOLS))
+            ))
+        self.kind = kind
+        self.pool = self.POOLS[kind](max_workers=max_workers or None)
+        self.worker_settings = worker_settings or {}
+        self.on_done = on_done
+        self.pending = 0
+        # whether each translator submitted so far could be pickled
+        self._picklable = {}
+
+    def __len__(self):
+        return self.pending
+
+    def can_submit(self, func):
+        """
+        Whether func can run in the pool. A process pool can't run the translators that can't be pickled, e.g. the
+        closures returned by translator factories: they are called in the reactor thread instead.
+        """
+        if self.kind!='process':
+            return True
+        picklable = self._picklable.get(func)
+        if picklable is None:
+            try:
+                pickle.dumps(func)
+            except Exception as e:
+                logger.info("Translator %r can't be pickled, it runs in the reactor thread: %s", func, e)
+                picklable = False
+            else:
+                picklable = True
+            self._picklable[func] = picklable
+        return picklable
+
+    def submit(self, func, *args, **kwargs):
+        d = defer.Deferred()
+        self.pending += 1
+        future = self.pool.submit(func, *args, **kwargs)
+        from twisted.internet import reactor
+        future.add_done_callback(lambda future: reactor.callFromThread(self._done, future, d))
+        return d
+
+    def submit_language_translate(self, mw, source_lang_code, target_lang_code, text):
+        if self.kind=='process':
+            return self.submit(
+                _worker_language_translate, mw.__class__, self.worker_settings,
+                source_lang_code, target_lang_code, text
+            )
+        return self.submit(mw.language_translate, source_lang_code, target_lang_code, text)
+
+    def _done(self, future, d):
+        self.pending -= 1
+        try:
+            result = future.result()
+        except Exception as e:
+            d.errback(e)
+        else:
+            d.callback(result)
+        if self.on_done is not None:
+            self.on_done()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
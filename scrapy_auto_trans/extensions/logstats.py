@@ -0,0 +1,72 @@
+"""
+Periodically log the translation stats
+"""
+import logging
+from twisted.internet import task
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from ..stats import latency_percentile
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationLogStats:
+    """
+    Logs every AUTO_TRANSLATION_LOGSTATS_INTERVAL seconds (60 by default) how many items were translated,
+    what was sent to the translation services and how long it took
+    """
+
+    def __init__(self, stats, interval=60.0):
+        self.stats = stats
+        self.interval = interval
+        self.multiplier = 60.0 / self.interval
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        interval = crawler.settings.getfloat('AUTO_TRANSLATION_LOGSTATS_INTERVAL', 60.0)
+        if not interval:
+            raise NotConfigured
+        o = cls(crawler.stats, interval)
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_opened(self, spider):
+        self.itemsprev = 0
+        self.requestsprev = 0
+        self.task = task.LoopingCall(self.log, spider)
+        self.task.start(self.interval, now=False)
+
+    def log(self, spider):
+        stats = self.stats.get_stats()
+        items = stats.get('auto_translation/items/translated', 0)
+        requests = stats.get('auto_translation/requests', 0)
+        irate = (items - self.itemsprev) * self.multiplier
+        rrate = (requests - self.requestsprev) * self.multiplier
+        self.itemsprev, self.requestsprev = items, requests
+
+        msg = (
+            "Translated %(items)d items (at %(itemrate)d items/min), "
+            "sent %(requests)d translation requests (at %(requestrate)d requests/min, %(characters)d characters), "
+            "%(failed)d failed; %(inflight)d items in flight; "
+            "item latency p50 %(item_p50)s p95 %(item_p95)s, request latency p50 %(request_p50)s p95 %(request_p95)s"
+        )
+        log_args = {
+            'items': items,
+            'itemrate': irate,
+            'requests': requests,
+            'requestrate': rrate,
+            'characters': stats.get('auto_translation/characters', 0),
+            'failed': stats.get('auto_translation/requests_failed', 0),
+            'inflight': stats.get('auto_translation/inflight_items', 0),
+        }
+        for name in ('item', 'request'):
+            for percentile in (50, 95):
+                bound = latency_percentile(stats, name, percentile)
+                log_args['%s_p%d'%(name, percentile)] = '-' if bound is None else '<=%gs'%bound
+        logger.info(msg, log_args, extra={'spider': spider})
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
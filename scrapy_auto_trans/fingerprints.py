@@ -0,0 +1,56 @@
+"""
+Remember the translations of the last crawl, so that unchanged source values aren't translated again
+"""
+import hashlib
+import json
+from .cache import SqliteWriter
+
+
+def digest(*values):
+    """
+    16 bytes hash of JSON-serializable values
+    """
+    data = json.dumps(values, ensure_ascii=False, sort_keys=True, default=str).encode('utf8')
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class FingerprintIndex(SqliteWriter):
+    """
+    Maps (item identity, field name) to the hash of the source value the field was translated from and the
+    translation itself, in a SQLite file. Both the key and the source are stored as 16 bytes hashes.
+    The file is only opened when the index is first used, and rows are read one at a time. Writes are committed
+    by a background thread, see SqliteWriter.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS fingerprints ('
+        'key BLOB PRIMARY KEY, source BLOB NOT NULL, translation TEXT NOT NULL) WITHOUT ROWID'
+    )
+    THREAD_NAME = 'auto-translation-fingerprints'
+    ROWS_NAME = 'fingerprints'
+
+    def get(self, key, source):
+        """
+        Returns the translation recorded for key if it was made from the same source, None otherwise
+        """
+        key = digest(*key)
+        row = self._get_pending(key)
+        if row is None:
+            row = self._open().execute(
+                'SELECT source, translation FROM fingerprints WHERE key=?', (key,)
+            ).fetchone()
+        if row is None or row[0]!=digest(source):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[1])
+
+    def set(self, key, source, translation):
+        self._open()
+        self._queue(digest(*key), (digest(source), json.dumps(translation, ensure_ascii=False)))
+
+    def write_rows(self, conn, rows):
+        conn.executemany(
+            'INSERT OR REPLACE INTO fingerprints (key, source, translation) VALUES (?, ?, ?)',
+            [(key,) + row for key, row in rows.items()]
+        )
@@ -0,0 +1,140 @@
+"""
+Glossaries of known terms (names, units, labels) and their translations, looked up before the translation services
+"""
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# a letter, digits and punctuation left over once the terms are taken out don't need a translation
+LETTER_RE = re.compile(r'[^\W\d_]')
+
+
+def read_glossary_file(path):
+    """
+    Returns the {term: translation} dict of a JSON object file, or of a TSV file with a term and its
+    translation on each line (empty lines and lines starting with # are skipped)
+    """
+    with open(path, encoding='utf8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        terms = {}
+        for line_number, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            columns = line.split('\t')
+            if len(columns)<2:
+                logger.warning("Skipping line %d of the glossary %s: no tab", line_number, path)
+                continue
+            terms[columns[0]] = columns[1]
+        return terms
+
+
+def trie_pattern(terms):
+    """
+    Returns a regular expression matching any of the terms, with their common prefixes factored out so that
+    the regex engine walks a trie instead of trying every term at each position
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[None] = True
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    alternatives = [re.escape(char) + _node_pattern(child) for char, child in sorted(
+        (char, child) for char, child in node.items() if char is not None
+    )]
+    if not alternatives:
+        return ''
+    pattern = alternatives[0] if len(alternatives)==1 else '(?:%s)'%'|'.join(alternatives)
+    if None in node:
+        # the longest term is tried first, the (?!\w) boundary backtracks to the shorter one
+        return '(?:%s)?'%pattern
+    return pattern
+
+
+class Glossary:
+    """
+    Translations of the terms of one language pair. A text that is a term is translated by an exact lookup, the
+    terms found inside longer texts are matched by a single compiled pattern. Terms match whole words only,
+    with ignore_case regardless of their case.
+    """
+
+    def __init__(self, terms, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.terms = {}
+        for term, translation in terms.items():
+            term = self.normalize(term)
+            if term:
+                self.terms[term] = translation
+        self.pattern = None
+        if self.terms:
+            self.pattern = re.compile(
+                r'(?<!\w)%s(?!\w)'%trie_pattern(self.terms), re.IGNORECASE if ignore_case else 0
+            )
+
+    def __len__(self):
+        return len(self.terms)
+
+    def normalize(self, term):
+        term = ' '.join(term.split())
+        return term.lower() if self.ignore_case else term
+
+    def lookup(self, text):
+        """
+        Returns the translation of a text that is a term, keeping its surrounding whitespace, None otherwise
+        """
+        stripped = text.strip()
+        translation = self.terms.get(self.normalize(stripped))
+        if translation is None:
+            return None
+        start = text.index(stripped)
+        return text[:start] + translation + text[start + len(stripped):]
+
+    def substitute(self, text):
+        """
+        Returns the text with the terms it contains replaced by their translations, and how many were replaced
+        """
+        if self.pattern is None:
+            return text, 0
+        return self.pattern.subn(self._replacement, text)
+
+    def _replacement(self, match):
+        return self.terms[self.normalize(match.group(0))]
+
+    def translate(self, text):
+        """
+        Returns the translation of a text made of terms only (besides numbers and punctuation), None otherwise
+        """
+        translation = self.lookup(text)
+        if translation is not None or self.pattern is None:
+            return translation
+        if LETTER_RE.search(self.pattern.sub('', text)):
+            return None
+        return self.substitute(text)[0]
+
+
+def load_glossaries(config, ignore_case=False):
+    """
+    Returns the Glossary of each (source language, target language) pair of config, a dict with
+    "<source language>:<target language>" keys and, as values, the path of a glossary file, a list of paths,
+    or a {term: translation} dict
+    """
+    glossaries = {}
+    for language_pair, sources in config.items():
+        source_lang_code, _, target_lang_code = language_pair.partition(':')
+        if not target_lang_code:
+            raise ValueError("Glossary languages must be given as '<source>:<target>', got %r"%language_pair)
+        if isinstance(sources, (str, dict)):
+            sources = [sources]
+        terms = {}
+        for source in sources:
+            terms.update(source if isinstance(source, dict) else read_glossary_file(source))
+        glossaries[(source_lang_code, target_lang_code)] = Glossary(terms, ignore_case=ignore_case)
+    return glossaries
@@ -0,0 +1,120 @@
+"""
+Translation plans: what the middleware needs to know about the translated fields of an Item class
+"""
+from collections import namedtuple
+import scrapy
+from . import FailureAction
+
+FieldPlan = namedtuple('FieldPlan', [
+    'name',             # target field
+    'source',           # source field, or None
+    'language',         # target language, or None
+    'source_language',  # language of the source field, or None
+    'translate',        # translator function, or None for the middleware's translate()
+    'on_failure',       # FailureAction
+    'offload',          # whether the translator may run in the middleware's executor
+    'incremental',      # whether the translation of an unchanged source may be taken from the fingerprint index
+    'reference',        # ReferenceData the translator is called with, or None
+    'kwargs',           # field options handed to the translator and its callbacks
+])
+
+
+def iter_item_classes(base=scrapy.Item):
+    """
+    Yields the subclasses of base defined so far
+    """
+    for item_cls in base.__subclasses__():
+        yield item_cls
+        for subclass in iter_item_classes(item_cls):
+            yield subclass
+
+
+class TranslationPlan:
+    """
+    Built once per Item class, then only read.
+    A field whose source is another translated field depends on it. Fields are sorted in layers: the fields of
+    the first layer depend on no other field, the ones of the next layers on fields of the previous layers only;
+    within a layer, fields are kept in the order of item_cls.fields. Circular dependencies raise a ValueError.
+    """
+
+    def __init__(self, item_cls, tag):
+        self.item_cls = item_cls
+        fields = []
+        for name, field in item_cls.fields.items():
+            if not field.get(tag):
+                continue
+            source = field.get('source')
+            source_field = item_cls.fields.get(source, {}) if source is not None else {}
+            kwargs = dict(field)
+            kwargs.pop(tag, None)
+            kwargs.pop('translate', None)
+            kwargs.pop('offload', None)
+            kwargs.pop('incremental', None)
+            kwargs.pop('reference', None)
+            fields.append(FieldPlan(
+                name=name,
+                source=source,
+                language=field.get('language'),
+                source_language=source_field.get('language'),
+                translate=field.get('translate'),
+                on_failure=field.get('on_failure') or FailureAction.REPORT_IN_FIELD,
+                offload=field.get('offload', True),
+                # a translator's output may depend on more than the source value, e.g. on exchange rates
+                incremental=field.get('incremental', field.get('translate') is None),
+                reference=field.get('reference') or getattr(field.get('translate'), 'reference', None),
+                kwargs=kwargs,
+            ))
+        # translated fields each field is derived from
+        self.dependencies = {
+            field_plan.name: tuple(
+                source for source in (field_plan.source,) if any(other.name==source for other in fields)
+            )
+            for field_plan in fields
+        }
+        self.layers = self.sort_layers(fields)
+        self.fields = tuple(field_plan for layer in self.layers for field_plan in layer)
+        self.fields_by_name = {field_plan.name: field_plan for field_plan in self.fields}
+
+    def __bool__(self):
+        return bool(self.fields)
+
+    def sort_layers(self, fields):
+        layers = []
+        done = set()
+        remaining = list(fields)
+        while remaining:
+            layer = [
+                field_plan for field_plan in remaining
+                if all(dependency in done for dependency in self.dependencies[field_plan.name])
+            ]
+            if not layer:
+                raise ValueError("Circular dependency between the translated fields of %s: %s"%(
+                    self.item_cls.__name__, ' -> '.join(self.find_cycle(remaining))
+                ))
+            layers.append(tuple(layer))
+            done.update(field_plan.name for field_plan in layer)
+            remaining = [field_plan for field_plan in remaining if field_plan.name not in done]
+        return tuple(layers)
+
+    def find_cycle(self, fields):
+        names = [fields[0].name]
+        while True:
+            name = self.dependencies[names[-1]][0]
+            if name in names:
+                return names[names.index(name):] + [name]
+            names.append(name)
+
+    def resolve_source_languages(self, get_source_language_code):
+        """
+        Replaces the declared source languages with the ones returned by get_source_language_code(source_field)
+        """
+        self.fields = tuple(
+            field_plan._replace(
+                source_language=get_source_language_code(self.item_cls.fields.get(field_plan.source, {}))
+            ) if field_plan.source is not None else field_plan
+            for field_plan in self.fields
+        )
+        self.fields_by_name = {field_plan.name: field_plan for field_plan in self.fields}
+        self.layers = tuple(
+            tuple(self.fields_by_name[field_plan.name] for field_plan in layer) for layer in self.layers
+        )
@@ -0,0 +1,133 @@
+"""
+Tell the texts that don't need a translation service apart: empty values, numbers, URLs, codes, and texts that are
+in the target language already
+"""
+import re
+
+LETTER_RE = re.compile(r'[^\W\d_]')
+URL_RE = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*://|www\.)\S+$')
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.\w+$')
+# a single token of ASCII letters and at least one digit: product codes, references, postcodes
+CODE_RE = re.compile(r'^(?=\S*\d)[A-Za-z0-9./#:+-]+$')
+# but a number followed by lowercase letters is a quantity or an ordinal: 5km, 3rd
+QUANTITY_RE = re.compile(r'^\d+(?:[.,]\d+)?[a-z]+$')
+
+HAN = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0002ebef'
+KANA = '\u3040-\u30ff\u31f0-\u31ff\uff66-\uff9f'
+HANGUL = '\u1100-\u11ff\u3130-\u318f\uac00-\ud7af'
+
+# by target language: the letters a text of that language is made of, and the ones it must contain.
+# Only the scripts that tell a language apart are listed; Latin, Cyrillic or Arabic texts need the language
+# identifier.
+TARGET_SCRIPTS = {
+    'zh': (HAN, HAN),
+    'ja': (HAN + KANA, KANA),
+    'ko': (HANGUL + HAN, HANGUL),
+    'th': ('\u0e00-\u0e7f', '\u0e00-\u0e7f'),
+    'el': ('\u0370-\u03ff\u1f00-\u1fff', '\u0370-\u03ff\u1f00-\u1fff'),
+    'he': ('\u0590-\u05ff', '\u0590-\u05ff'),
+    'iw': ('\u0590-\u05ff', '\u0590-\u05ff'),
+    'hy': ('\u0530-\u058f', '\u0530-\u058f'),
+    'ka': ('\u10a0-\u10ff', '\u10a0-\u10ff'),
+    'km': ('\u1780-\u17ff', '\u1780-\u17ff'),
+    'lo': ('\u0e80-\u0eff', '\u0e80-\u0eff'),
+    'my': ('\u1000-\u109f', '\u1000-\u109f'),
+    'si': ('\u0d80-\u0dff', '\u0d80-\u0dff'),
+    'ta': ('\u0b80-\u0bff', '\u0b80-\u0bff'),
+    'te': ('\u0c00-\u0c7f', '\u0c00-\u0c7f'),
+    'kn': ('\u0c80-\u0cff', '\u0c80-\u0cff'),
+    'ml': ('\u0d00-\u0d7f', '\u0d00-\u0d7f'),
+    'gu': ('\u0a80-\u0aff', '\u0a80-\u0aff'),
+    'pa': ('\u0a00-\u0a7f', '\u0a00-\u0a7f'),
+    'am': ('\u1200-\u139f', '\u1200-\u139f'),
+}
+
+
+# by target language, the other source languages whose texts may be written in the target's script only, e.g.
+# Japanese names in kanji, or Korean ones in hanja, going to Chinese
+SHARED_SCRIPTS = {
+    'zh': ('ja', 'ko'),
+}
+
+# languages whose variants write the same words with different letters: a Chinese text in Han characters may still
+# need converting to simplified (zh-CN) or traditional (zh-TW) characters
+SCRIPT_VARIANTS = ('zh',)
+
+
+def base_language(language_code):
+    return language_code.replace('_', '-').split('-')[0].lower()
+
+
+class TranslationPrefilter:
+    """
+    check() returns why a text needs no translation, or None when it has to be translated.
+    A text counts as written in the target language when all its letters belong to the script of that language
+    (see TARGET_SCRIPTS) or, with an identifier, when the identifier tells the target language with at least
+    `threshold` confidence. Texts shorter than min_letters letters are too short to be identified reliably.
+    Neither tells variants of the same language apart (zh-TW from zh-CN), nor the languages of SHARED_SCRIPTS:
+    these texts are always translated, and so are the texts going to a variant of the SCRIPT_VARIANTS languages.
+    identifier is an object whose identify(text) method returns a (language code, confidence) tuple.
+    """
+
+    def __init__(self, identifier=None, threshold=0.9, min_letters=20):
+        self.identifier = identifier
+        self.threshold = threshold
+        self.min_letters = min_letters
+        self._script_res = {
+            language: (re.compile('[%s]'%letters), re.compile('[%s]'%required))
+            for language, (letters, required) in TARGET_SCRIPTS.items()
+        }
+
+    def check(self, text, source_lang_code, target_lang_code):
+        stripped = text.strip()
+        if not stripped:
+            return 'empty'
+        letters = len(LETTER_RE.findall(stripped))
+        if not letters:
+            return 'no_letters'
+        if URL_RE.match(stripped):
+            return 'url'
+        if EMAIL_RE.match(stripped):
+            return 'email'
+        if CODE_RE.match(stripped) and not QUANTITY_RE.match(stripped):
+            return 'code'
+        target_language = base_language(target_lang_code)
+        if source_lang_code==target_lang_code:
+            return 'same_language'
+        source_language = base_language(source_lang_code)
+        if source_language==target_language or source_language in SHARED_SCRIPTS.get(target_language, ()):
+            # the text would look like the target language whether it's translated or not
+            return None
+        if target_language in SCRIPT_VARIANTS and target_lang_code.replace('_', '-').lower()!=target_language:
+            # the script doesn't tell which variant the text is written in
+            return None
+        script_res = self._script_res.get(target_language)
+        if script_res is not None:
+            letters_re, required_re = script_res
+            if len(letters_re.findall(stripped))==letters and required_re.search(stripped):
+                return 'target_script'
+            # the script tells the language, the identifier has nothing to add
+            return None
+        if self.identifier is not None and letters>=self.min_letters:
+            language, confidence = self.identifier.identify(stripped)
+            if base_language(language)==target_language and confidence>=self.threshold:
+                return 'target_language'
+        return None
+
+
+class LangidIdentifier:
+    """
+    Language identifier based on the n-gram model of langid.py (pip install langid), loaded once
+    """
+
+    def __init__(self, languages=None):
+        try:
+            from langid.langid import LanguageIdentifier, model
+        except ImportError:
+            raise ImportError("LangidIdentifier needs the langid package: pip install langid")
+        self.identifier = LanguageIdentifier.from_modelstring(model, norm_probs=True)
+        if languages:
+            self.identifier.set_languages(languages)
+
+    def identify(self, text):
+        return self.identifier.classify(text)
@@ -0,0 +1,110 @@
+"""
+Reference data shared by translators: exchange rates, unit tables, lookup lists fetched once rather than by every
+field of every item
+"""
+import time
+import scrapy
+from twisted.internet import defer
+
+
+class ReferenceData:
+    """
+    A page fetched from url and parsed by parse(response) into whatever the translators need, e.g. a
+    {currency: rate} dict. The parsed data is kept for ttl seconds (None or 0: for the whole crawl), then
+    fetched again the next time a translator needs it. Other keyword arguments are passed to scrapy.Request.
+    """
+
+    def __init__(self, url, parse, ttl=3600, **request_kwargs):
+        self.url = url
+        self.parse = parse
+        self.ttl = ttl
+        self.request_kwargs = request_kwargs
+
+    def __repr__(self):
+        return '<%s %s>'%(self.__class__.__name__, self.url)
+
+    def make_request(self):
+        """
+        The request is downloaded directly, without going through the scheduler and the spider middlewares
+        """
+        return scrapy.Request(self.url, **self.request_kwargs)
+
+
+def uses_reference(reference):
+    """
+    Decorator of the translators that need a ReferenceData: they are called with the parsed data as their
+    `reference` keyword argument, once it is loaded
+    """
+    def decorator(translate):
+        translate.reference = reference
+        return translate
+    return decorator
+
+
+class ReferenceCache:
+    """
+    The parsed data of each ReferenceData, until its ttl expires.
+    wait() returns a Deferred firing with the data of a reference that isn't loaded; the Deferreds handed out
+    while a reference is being loaded fire together once it is, with loaded(), or failed().
+    """
+
+    MISSING = object()
+
+    def __init__(self):
+        # (data, expiry time) by ReferenceData
+        self._entries = {}
+        # Deferreds waiting for the load of a ReferenceData
+        self._waiters = {}
+        self.loads = 0
+        self.hits = 0
+        self.waits = 0
+        self.errors = 0
+
+    def __len__(self):
+        return sum(len(ds) for ds in self._waiters.values())
+
+    def get(self, reference):
+        """
+        Returns the data of a loaded reference, MISSING when it has to be loaded first
+        """
+        entry = self._entries.get(reference)
+        if entry is None:
+            return self.MISSING
+        data, expires = entry
+        if expires is not None and expires<=time.monotonic():
+            del self._entries[reference]
+            return self.MISSING
+        self.hits += 1
+        return data
+
+    def is_loading(self, reference):
+        return reference in self._waiters
+
+    def wait(self, reference):
+        d = defer.Deferred()
+        self.waits += 1
+        self._waiters.setdefault(reference, []).append(d)
+        return d
+
+    def loaded(self, reference, data):
+        self.loads += 1
+        expires = time.monotonic() + reference.ttl if reference.ttl else None
+        self._entries[reference] = (data, expires)
+        for d in self._waiters.pop(reference, []):
+            d.callback(data)
+
+    def failed(self, reference, failure):
+        """
+        The waiting translators fail, the next one to need the reference loads it again
+        """
+        self.errors += 1
+        for d in self._waiters.pop(reference, []):
+            d.errback(failure)
+
+    def stats(self):
+        return {
+            'loads': self.loads,
+            'hits': self.hits,
+            'waits': self.waits,
+            'errors': self.errors,
+        }
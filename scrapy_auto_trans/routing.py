@@ -0,0 +1,112 @@
+"""
+Pick a translation backend for each request, from the latencies and failures seen so far
+"""
+from collections import deque
+import time
+
+
+class BackendHealth:
+    """
+    Latencies of the last `window` successful requests of a backend, and its failures in a row
+    """
+
+    def __init__(self, window=200):
+        self.latencies = deque(maxlen=window)
+        self.failures = 0
+        self.cooldown_until = 0
+
+    def is_available(self, now=None):
+        return self.cooldown_until<=(time.monotonic() if now is None else now)
+
+    def latency_percentile(self, percentile):
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100.0))]
+
+
+class TranslationRouter:
+    """
+    Sends each request to the available backend with the lowest median latency; backends that have no latency
+    yet come first, in their configuration order, so that each of them gets measured.
+    A backend that fails failure_threshold times in a row is set aside for `cooldown` seconds.
+    Once a backend has min_samples latencies, a request that takes longer than its hedge_percentile latency is
+    hedged: the same texts are sent to another backend and the first answer wins (0 disables hedging).
+    """
+
+    def __init__(self, backends, hedge_percentile=95, min_samples=20, failure_threshold=3, cooldown=30.0,
+                 window=200):
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health = {backend.name: BackendHealth(window) for backend in self.backends}
+
+    def choose(self, exclude=(), fallback=False):
+        """
+        Returns the best available backend but the excluded ones, None if there's none.
+        With fallback, the backend that comes out of its cooldown first is returned when none is available.
+        """
+        now = time.monotonic()
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        available = [backend for backend in candidates if self.health[backend.name].is_available(now)]
+        if not available:
+            if fallback and candidates:
+                return min(candidates, key=lambda backend: self.health[backend.name].cooldown_until)
+            return None
+        return min(available, key=lambda backend: (
+            self.health[backend.name].latency_percentile(50) or 0, self.backends.index(backend)
+        ))
+
+    def hedge_delay(self, backend):
+        """
+        Seconds after which a request sent to backend is hedged, None if it isn't
+        """
+        health = self.health[backend.name]
+        if not self.hedge_percentile or len(health.latencies)<max(1, self.min_samples):
+            return None
+        return health.latency_percentile(self.hedge_percentile)
+
+    def succeeded(self, backend, latency):
+        health = self.health[backend.name]
+        health.latencies.append(latency)
+        health.failures = 0
+
+    def failed(self, backend):
+        health = self.health[backend.name]
+        health.failures += 1
+        if self.failure_threshold and health.failures>=self.failure_threshold:
+            health.cooldown_until = time.monotonic() + self.cooldown
+            health.failures = 0
+
+
+class RoutedTranslation:
+    """
+    A batch of texts and the requests (attempts) sent to translate it; the first successful one resolves it
+    """
+    __slots__ = ('batch', 'attempts', 'tried', 'done', 'hedge_call')
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.attempts = set()
+        self.tried = []
+        self.done = False
+        self.hedge_call = None
+
+    def cancel_hedge(self):
+        if self.hedge_call is not None and self.hedge_call.active():
+            self.hedge_call.cancel()
+        self.hedge_call = None
+
+
+class RoutedAttempt:
+    """
+    One request of a RoutedTranslation, sent to one backend
+    """
+    __slots__ = ('routed', 'backend', 'started')
+
+    def __init__(self, routed, backend):
+        self.routed = routed
+        self.backend = backend
+        self.started = time.monotonic()
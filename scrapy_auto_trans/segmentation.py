@@ -0,0 +1,21 @@
+"""
+Split long texts into sentences that are translated one by one, then put back together
+"""
+import re
+
+# the whitespace after a sentence end, or a line break
+SEGMENT_SEPARATOR_RE = re.compile(r'((?<=[.!?])\s+|(?<=[。！？])\s*|\s*\n\s*)')
+
+
+def split_segments(text):
+    """
+    Returns the (segment, separator) pairs of text, so that joining them gives back the text
+    """
+    parts = SEGMENT_SEPARATOR_RE.split(text)
+    if len(parts) % 2:
+        parts.append('')
+    return list(zip(parts[::2], parts[1::2]))
+
+
+def join_segments(segments):
+    return ''.join(segment + separator for segment, separator in segments)
@@ -2,164 +2,887 @@
 Automatically translate specified item fields
 """
 import scrapy
-import types
+import inspect
+import itertools
+import time
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import defer
+from twisted.python.failure import Failure
 from .. import exceptions as excs
 from .. import FailureAction
-from urllib.parse import quote as urlquote, unquote as urlunquote
-import requests
-import json
+from ..batching import TranslationBatch, TranslationBatcher
+from ..cache import LRUTranslationCache, SqliteTranslationStore
+from ..plan import TranslationPlan, iter_item_classes
+from ..dispatch import TranslationDispatcher, CHARACTERS_META_KEY
+from ..executor import TranslationExecutor
+from ..segmentation import split_segments, join_segments
+from ..fingerprints import FingerprintIndex
+from ..glossary import load_glossaries
+from ..cluster import ClusterTranslationCache
+from ..prefilter import TranslationPrefilter
+from ..reference import ReferenceCache
+from ..spool import TranslationSpool
+from ..stats import observe_latency, FAILURE_ACTION_NAMES
+from ..backends import (
+    GOOGLE_TRANSLATE_URL, google_translate_url, google_translate_post_request, google_translate_results
+)
+from ..routing import TranslationRouter, RoutedTranslation, RoutedAttempt
+from scrapy.utils.misc import load_object
 import logging
 
 logger = logging.getLogger(__name__)
 
+class ItemTranslationState:
+    """
+    Translation progress of a single item, shared by all the translation requests sent for it.
+    The copy of the item is the only buffer of its translated fields.
+    """
+    __slots__ = (
+        'item', 'plan', 'pending', 'dropped', 'busy', 'inflight', 'failed', 'reused', 'spooled', 'retries', 'started',
+    )
+
+    def __init__(self, item, plan):
+        self.item = item.copy()
+        self.plan = plan
+        self.pending = set()
+        self.dropped = False
+        self.busy = False
+        self.inflight = False
+        # fields filled by a failure action, and fields taken from the fingerprint index
+        self.failed = set()
+        self.reused = set()
+        # pending fields held in the failure spool, and how many times each field was spooled
+        self.spooled = set()
+        self.retries = {}
+        self.started = time.monotonic()
+
+    def __getstate__(self):
+        """
+        Pickled by the failure spool without its plan, which the middleware gives back, see drain_spool()
+        """
+        state = {name: getattr(self, name) for name in self.__slots__ if name not in ('plan', 'started')}
+        state['elapsed'] = time.monotonic() - self.started
+        return state
+
+    def __setstate__(self, state):
+        self.plan = None
+        self.started = time.monotonic() - state.pop('elapsed')
+        for name, value in state.items():
+            setattr(self, name, value)
+
+class PendingTranslationRequest:
+    """
+    A translation request on its way. The middleware keeps it in a registry, only its token is put in request.meta
+    """
+    __slots__ = ('token', 'key', 'waiters', 'batch', 'backend', 'started')
+
+    def __init__(self, token, key=None, batch=None, backend=None):
+        self.token = token
+        self.key = key
+        self.backend = backend
+        self.started = time.monotonic()
+        # (item state, target field name, callback) tuples
+        self.waiters = []
+        self.batch = batch
+
 class AutoTranslationMiddlewareBase:
 
     META_KEY = 'scrapy-auto-translation-middleware'
     TAG = 'auto_translate'
     DEFAULT_LANGUAGE= 'en'
     IN_FIELD_ERROR_MSG = '--- translation error ---'
+    # whether translation requests are always downloaded by a TranslationDispatcher
+    USE_DISPATCHER = False
+    # AUTO_TRANSLATION_* settings handed to the middleware instances of the worker processes
+    WORKER_SETTINGS = ()
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings)
+        if not crawler.settings.getbool('AUTO_TRANSLATION_ENABLED', True):
+            # items leave the spider untranslated, see the translate command
+            raise NotConfigured
+        mw = cls(crawler.settings)
+        mw.crawler = crawler
+        rate_limits = crawler.settings.getdict('AUTO_TRANSLATION_RATE_LIMITS')
+        if cls.USE_DISPATCHER or mw.max_inflight_items or mw.max_pending_requests or rate_limits:
+            mw.dispatcher = TranslationDispatcher(
+                crawler, mw.translation_downloaded,
+                max_pending_requests=mw.max_pending_requests,
+                rate_limits=rate_limits,
+                max_retries=crawler.settings.getint('AUTO_TRANSLATION_RATE_LIMIT_RETRIES', 5),
+            )
+        crawler.signals.connect(mw.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        mw.build_translation_plans()
+        return mw
 
     def __init__(self, settings):
         self.settings = settings
+        self.crawler = None
+        self.concurrent_fields = settings.getbool('AUTO_TRANSLATION_CONCURRENT_FIELDS', False)
+        # items and requests produced by deferred field translations, see flush_outputs()
+        self._outbox = []
+        self._outbox_error = None
+        # PendingTranslationRequest by token, and by request key for the ones that can be shared
+        self._pending_requests = {}
+        self._inflight_requests = {}
+        self._tokens = itertools.count(1)
+        self.inflight_items = 0
+        # TranslationPlan by Item class
+        self._plans = {}
+        # backpressure: the engine is paused while too many items wait for their translations
+        self.max_inflight_items = settings.getint('AUTO_TRANSLATION_MAX_INFLIGHT_ITEMS', 0)
+        self.max_pending_requests = settings.getint('AUTO_TRANSLATION_MAX_PENDING_REQUESTS', 0)
+        self.dispatcher = None
+        self._engine_paused = False
+        # items waiting to be sent to the engine by an output request, see emit_later()
+        self._later_outputs = []
+        # coroutines and other awaitables returned by the translators that are still running, see as_deferred()
+        self.running_awaitables = 0
+        # synchronous translators run in a thread or process pool, see TranslationExecutor
+        self.executor = None
+        if settings.get('AUTO_TRANSLATION_EXECUTOR'):
+            self.executor = TranslationExecutor(
+                settings.get('AUTO_TRANSLATION_EXECUTOR'),
+                max_workers=settings.getint('AUTO_TRANSLATION_EXECUTOR_WORKERS', 0),
+                worker_settings=self.get_worker_settings(settings),
+                on_done=self.flush_later,
+            )
+        # data of the ReferenceData the translators are called with
+        self.references = ReferenceCache()
+        # translations of the last crawl, see FingerprintIndex
+        self.fingerprints = None
+        self.fingerprint_key_field = settings.get('AUTO_TRANSLATION_FINGERPRINT_KEY_FIELD')
+        if settings.get('AUTO_TRANSLATION_FINGERPRINT_PATH'):
+            self.fingerprints = FingerprintIndex(
+                settings.get('AUTO_TRANSLATION_FINGERPRINT_PATH'),
+                flush_interval=settings.getfloat('AUTO_TRANSLATION_STORE_FLUSH_INTERVAL', 1.0),
+                flush_size=settings.getint('AUTO_TRANSLATION_STORE_FLUSH_SIZE', 500),
+            )
+
+    def get_worker_settings(self, settings):
+        """
+        Settings of the middleware instances built in the worker processes, which only call language_translate().
+        The AUTO_TRANSLATION_* settings are left out but the ones in WORKER_SETTINGS: the workers must not open
+        the caches, the spool or the pool of the crawl.
+        """
+        return {
+            name: value for name, value in settings.copy_to_dict().items()
+            if not name.startswith('AUTO_TRANSLATION_') or name in self.WORKER_SETTINGS
+        }
 
     def process_spider_output(self, response, result, spider):
 
+        if response is not None and self.META_KEY in response.request.meta:
+            # what comes out of a translation response has been taken care of already
+            for x in result:
+                yield x
+            return
+
         for x in result:
             if isinstance(x, (dict, scrapy.Request)):
                 yield x
             elif isinstance(x, scrapy.Item):
                 item = x
-                count_field_auto_trans = len([(k,v)for k,v in item.fields.items() if self.TAG in v ])
-                if count_field_auto_trans==0:
+                plan = self.get_translation_plan(item.__class__)
+                if not plan:
                     """
                     It's a brand new item but no fields are to be translated, let's yield it
                     """
                     yield item
-                trans_result = self.handle_untranslated_item(item)
-                # hopefully trans_result is a new request containing item in its meta data
-                yield trans_result
+                    continue
+                self.inc_stats('items/received')
+                # hopefully the results are new requests containing the item's translation state in their meta data
+                trans_results = self.handle_untranslated_item(item) + self.flush_outputs()
+                for trans_result in self.route_outputs(trans_results):
+                    yield trans_result
             else:
                 yield x
 
-    def handle_untranslated_item(self, item):
+    def handle_untranslated_item(self, item, state=None):
         """
-        Either returns the item or a new request that contains the item in its meta data
+        Returns a list containing either the translated item or the request(s) that carry on its translation.
+        By default the async fields are translated one after another. With AUTO_TRANSLATION_CONCURRENT_FIELDS
+        enabled, a request is sent for every async field at once and the item is emitted when the last one is back.
+        Fields translated into a Deferred never hold up the other fields.
         """
-        new_item = item.copy()
-        for field_name in item.fields:
-            if field_name not in item and item.fields[field_name].get(self.TAG):
-                """
-                A new target field that's yet to be translated
-                """
-                target_field = item.fields[field_name]
-                source_field_name = target_field['source']
-                kwargs = target_field.copy()
-                kwargs.pop(self.TAG)
-                if 'translate' in target_field:
-                    kwargs.pop('translate')
-                    translate_func = target_field['translate']
-                else:
-                    translate_func = self.translate
-                field_translation = translate_func(field_name, item, **kwargs)
-                if (
-                    isinstance(field_translation, (list, tuple)) 
-                    and len(field_translation)==2 
-                    and isinstance(field_translation[0], scrapy.Request)
-                    and callable(field_translation[1])
-                ):
-                    """
-                    the translation ends up with a (request, callback_function) tuple or list, 
-                    this is an ASYNC transation, let's stop the work for the time being
-                    """
+        if state is None:
+            state = ItemTranslationState(item, self.get_translation_plan(item.__class__))
+        if state.busy:
+            # a Deferred fired while the item is being walked, the outer call will carry on
+            return []
+        state.busy = True
+        try:
+            requests = self._translate_fields(state)
+        finally:
+            state.busy = False
+        if requests is None:
+            return []
 
-                    request, callback = field_translation
-                    request.meta['handle_httpstatus_all'] = True
-                    request.meta[self.META_KEY] = {
-                        'item': new_item,
-                        'target_field': field_name,
-                        'callback': callback,
-                    }
-                    return request
-                elif isinstance(field_translation, scrapy.Request):
-                    logger.warn("translate() returns a Request without callback function, " \
-                                "we yield this request but nobody will take care of the translation response")
-                    return field_translation
-                elif isinstance(field_translation, (str, list, tuple)):
+        new_item = state.item
+        if state.dropped:
+            return requests
+        if requests or state.pending:
+            if not requests and state.pending<=state.spooled:
+                # an item waiting for the failure spool only doesn't hold the engine back
+                self._set_item_inflight(state, False)
+                self.hold_spooled_item(state)
+            else:
+                self._set_item_inflight(state, True)
+            return requests
+
+        self._set_item_inflight(state, False)
+        if self.fingerprints is not None:
+            self.record_fingerprints(state)
+        self.item_translated_stats(state)
+        logger.debug("Translated item: %s", new_item)
+        # all fields are translated, now it's time to send the item to the engine (and more precesely, the exporter)
+        return [new_item]
+
+    def _translate_fields(self, state):
+        new_item = state.item
+        requests = []
+        # fields whose sources weren't translated yet
+        waiting = []
+        for field_plan in state.plan.fields:
+            field_name = field_plan.name
+            if field_name in new_item or field_name in state.pending:
+                continue
+            dependencies = state.plan.dependencies[field_name]
+            if dependencies:
+                if state.failed.intersection(dependencies):
+                    # its source holds a failure placeholder rather than a translation
+                    self.field_translation_failed(state, field_name)
+                    if state.dropped:
+                        return None
+                    continue
+                if any(dependency not in new_item for dependency in dependencies):
+                    # started as soon as the fields it is derived from are translated
+                    waiting.append(field_name)
+                    continue
+            """
+            A new target field that's yet to be translated
+            """
+            if self.fingerprints is not None and field_plan.incremental:
+                field_translation = self.get_fingerprint_translation(new_item, field_plan)
+                if field_translation is not None:
                     new_item[field_name] = field_translation
+                    state.reused.add(field_name)
+                    continue
+            if field_plan.reference is not None:
+                reference_data = self.get_reference_data(field_plan.reference)
+                if isinstance(reference_data, defer.Deferred):
+                    # the translator runs once the reference is loaded
+                    field_translation = reference_data.addCallback(self._reference_loaded, state, field_plan)
                 else:
-                    raise excs.TranslationErrorGeneral(
-                        "Translation error, the 'translate()' method returns an unknown type: %s"%str(type(field_translation))
-                    )
+                    field_translation = self.run_translator(state, field_plan, reference=reference_data)
+            else:
+                field_translation = self.run_translator(state, field_plan)
+            if self.is_async_translation(field_translation):
+                """
+                the translation ends up with a (request, callback_function) tuple or list,
+                this is an ASYNC transation, in sequential mode let's stop the work for the time being
+                """
+                request, callback = field_translation
+                request = self.make_translation_request(state, field_name, request, callback)
+                if request is not None:
+                    requests.append(request)
+                if not self.concurrent_fields:
+                    break
+            elif isinstance(field_translation, defer.Deferred):
+                state.pending.add(field_name)
+                field_translation.addCallbacks(
+                    self._deferred_field_translated, self._deferred_field_failed,
+                    callbackArgs=(state, field_name), errbackArgs=(state, field_name),
+                )
+                if state.dropped:
+                    return None
+            elif isinstance(field_translation, scrapy.Request):
+                logger.warn("translate() returns a Request without callback function, " \
+                            "we yield this request but nobody will take care of the translation response")
+                state.dropped = True
+                return [field_translation]
+            elif isinstance(field_translation, (str, list, tuple)):
+                new_item[field_name] = field_translation
+            else:
+                raise excs.TranslationErrorGeneral(
+                    "Translation error, the 'translate()' method returns an unknown type: %s"%str(type(field_translation))
+                )
+        if (self.concurrent_fields or not requests) and any(
+            field_name not in new_item and field_name not in state.pending
+            and all(dependency in new_item for dependency in state.plan.dependencies[field_name])
+            for field_name in waiting
+        ):
+            # the sources of waiting fields were translated during the walk, e.g. by a Deferred fired meanwhile
+            more_requests = self._translate_fields(state)
+            if more_requests is None:
+                return None
+            requests.extend(more_requests)
+        return requests
 
-        print(new_item)
-        # all fields are translated, now it's time to send the item to the engine (and more precesely, the exporter)
-        return new_item
+    def run_translator(self, state, field_plan, **kwargs):
+        kwargs.update(field_plan.kwargs)
+        if field_plan.translate is not None and field_plan.offload and self.executor is not None \
+                and not inspect.iscoroutinefunction(field_plan.translate) \
+                and self.executor.can_submit(field_plan.translate):
+            # the translator gets a copy of the item, which keeps changing in the reactor thread
+            return self.executor.submit(field_plan.translate, field_plan.name, state.item.copy(), **kwargs)
+        translate_func = field_plan.translate or self.translate
+        return self.as_deferred(translate_func(field_plan.name, state.item, **kwargs))
+
+    def _reference_loaded(self, reference_data, state, field_plan):
+        if state.dropped:
+            return None
+        return self.run_translator(state, field_plan, reference=reference_data)
+
+    def get_reference_data(self, reference):
+        """
+        Returns the parsed data of a ReferenceData, or a Deferred firing with it once it is loaded. A single
+        request loads it, the translators needing it meanwhile are held until it's back.
+        The request is downloaded directly, like the dispatcher's: the items waiting for it count as in flight
+        and may have paused the engine.
+        """
+        reference_data = self.references.get(reference)
+        if reference_data is not ReferenceCache.MISSING:
+            return reference_data
+        loading = self.references.is_loading(reference)
+        d = self.references.wait(reference)
+        if not loading:
+            request = reference.make_request()
+            download = self.crawler.engine.download(request)
+            download.addBoth(self.reference_downloaded, reference)
+        return d
+
+    def reference_downloaded(self, result, reference):
+        """
+        Handles the Response or Failure of a reference request, then sends what the released translators produced
+        """
+        if isinstance(result, Failure):
+            logger.error("Unable to load the reference data of %s: %s", reference, result.getErrorMessage())
+            self.references.failed(reference, result)
+        elif result.status>=300:
+            logger.error("Unable to load the reference data of %s: response code %d", reference, result.status)
+            self.references.failed(reference, Failure(excs.TranslationErrorDueToInvalidResponseCode(result)))
+        else:
+            try:
+                reference_data = reference.parse(result)
+            except Exception as e:
+                logger.error("Unable to parse the reference data of %s: %r", result, e)
+                self.references.failed(reference, Failure())
+            else:
+                self.references.loaded(reference, reference_data)
+        self.flush_later()
+
+    def inc_stats(self, key, count=1):
+        if self.crawler is not None:
+            self.crawler.stats.inc_value('auto_translation/%s'%key, count)
+
+    def observe_latency(self, name, started):
+        if self.crawler is not None:
+            observe_latency(self.crawler.stats, name, time.monotonic() - started)
+
+    def item_translated_stats(self, state):
+        self.inc_stats('items/translated')
+        self.observe_latency('item', state.started)
+        for field_plan in state.plan.fields:
+            if field_plan.name in state.failed:
+                continue
+            if field_plan.name in state.reused:
+                self.inc_stats('fields/reused')
+                continue
+            self.inc_stats('fields/translated')
+            if field_plan.language is not None:
+                self.inc_stats('fields/translated/%s'%field_plan.language)
+
+    def get_fingerprint_key(self, item, field_plan):
+        """
+        Identifies the field of the item across crawls, returns None if the item can't be identified
+        """
+        if field_plan.source is None or not self.fingerprint_key_field:
+            return None
+        item_id = item.get(self.fingerprint_key_field)
+        if item_id is None:
+            return None
+        return (item.__class__.__name__, item_id, field_plan.name)
+
+    def get_fingerprint_source(self, item, field_plan):
+        return (item.get(field_plan.source), field_plan.source_language, field_plan.language)
+
+    def get_fingerprint_translation(self, item, field_plan):
+        key = self.get_fingerprint_key(item, field_plan)
+        if key is None:
+            return None
+        return self.fingerprints.get(key, self.get_fingerprint_source(item, field_plan))
+
+    def record_fingerprints(self, state):
+        """
+        Records the fields of a translated item, but the ones that failed or came from the index
+        """
+        for field_plan in state.plan.fields:
+            field_name = field_plan.name
+            if not field_plan.incremental or field_name in state.failed or field_name in state.reused:
+                continue
+            value = state.item.get(field_name)
+            if not isinstance(value, (str, list, tuple)):
+                continue
+            key = self.get_fingerprint_key(state.item, field_plan)
+            if key is not None:
+                self.fingerprints.set(key, self.get_fingerprint_source(state.item, field_plan), value)
+
+    def get_translation_plan(self, item_cls):
+        plan = self._plans.get(item_cls)
+        if plan is None:
+            plan = self._plans[item_cls] = self.build_translation_plan(item_cls)
+        return plan
+
+    def build_translation_plan(self, item_cls):
+        """
+        Called once per Item class
+        """
+        return TranslationPlan(item_cls, self.TAG)
+
+    def build_translation_plans(self):
+        """
+        Builds the plans of the Item classes defined so far, so that their errors (e.g. circular dependencies
+        between fields) stop the crawl before it starts
+        """
+        for item_cls in iter_item_classes():
+            self.get_translation_plan(item_cls)
+
+    def is_async_translation(self, field_translation):
+        return (
+            isinstance(field_translation, (list, tuple))
+            and len(field_translation)==2
+            and isinstance(field_translation[0], scrapy.Request)
+            and callable(field_translation[1])
+        )
+
+    def make_translation_request(self, state, field_name, request, callback):
+        """
+        Returns the request that translates the field. If an identical request is already on its way, the field
+        waits for that request's response instead and None is returned: every waiting (item, field) pair gets the
+        same response, each of them with its own callback.
+        """
+        state.pending.add(field_name)
+        waiter = (state, field_name, callback)
+        key = self.get_request_key(request)
+        pending_request = self._inflight_requests.get(key)
+        if pending_request is not None:
+            pending_request.waiters.append(waiter)
+            return None
+        pending_request = self.register_translation_request(request, key=key)
+        pending_request.waiters.append(waiter)
+        return request
+
+    def register_translation_request(self, request, key=None, batch=None):
+        backend = urlparse_cached(request).netloc
+        pending_request = PendingTranslationRequest(next(self._tokens), key=key, batch=batch, backend=backend)
+        self._pending_requests[pending_request.token] = pending_request
+        if key is not None:
+            self._inflight_requests[key] = pending_request
+        # identical requests are coalesced by the middleware, they must not be dropped by the dupefilter
+        request.dont_filter = True
+        request.callback = self.translation_response_received
+        request.errback = self.translation_request_failed
+        request.meta['handle_httpstatus_all'] = True
+        request.meta[self.META_KEY] = pending_request.token
+        self._update_inflight_stats()
+        self.inc_stats('requests')
+        self.inc_stats('requests/%s'%backend)
+        characters = request.meta.get(CHARACTERS_META_KEY)
+        if characters:
+            self.inc_stats('characters', characters)
+            self.inc_stats('characters/%s'%backend, characters)
+        return pending_request
+
+    def pop_translation_request(self, request):
+        pending_request = self._pending_requests.pop(request.meta[self.META_KEY], None)
+        if pending_request is not None:
+            if pending_request.key is not None:
+                self._inflight_requests.pop(pending_request.key, None)
+            self._update_inflight_stats()
+            self.observe_latency('request', pending_request.started)
+            self.observe_latency('backend/%s'%pending_request.backend, pending_request.started)
+        return pending_request
+
+    def _set_item_inflight(self, state, inflight):
+        if state.inflight!=inflight:
+            state.inflight = inflight
+            self.inflight_items += 1 if inflight else -1
+            self._update_inflight_stats()
+            if self.max_inflight_items:
+                self._apply_backpressure()
+
+    def _apply_backpressure(self):
+        engine = self.crawler.engine if self.crawler is not None else None
+        if engine is None:
+            return
+        if not self._engine_paused and self.inflight_items>=self.max_inflight_items:
+            self._engine_paused = True
+            engine.pause()
+            self.crawler.stats.inc_value('auto_translation/backpressure/pauses')
+        elif self._engine_paused and self.inflight_items<self.max_inflight_items:
+            self._engine_paused = False
+            engine.unpause()
+            # get the engine going right away instead of on its next heartbeat
+            slot = getattr(engine, 'slot', None)
+            if slot is not None:
+                slot.nextcall.schedule()
+
+    def spider_idle(self, spider):
+        if self.dispatcher is not None and len(self.dispatcher):
+            # requests are waiting for their backend
+            raise DontCloseSpider
+        if self.executor is not None and len(self.executor):
+            # translators are still running in the pool
+            raise DontCloseSpider
+        if self.running_awaitables:
+            raise DontCloseSpider
+        if len(self.references):
+            # translators wait for a reference request
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.crawler is not None:
+            for name, value in self.references.stats().items():
+                if value:
+                    self.crawler.stats.set_value('auto_translation/references/%s'%name, value, spider=spider)
+        if self.fingerprints is not None:
+            self.fingerprints.close()
+            if self.crawler is not None:
+                for name, value in self.fingerprints.stats().items():
+                    self.crawler.stats.set_value('auto_translation/fingerprints/%s'%name, value, spider=spider)
+
+    def is_translation_request(self, request):
+        return isinstance(request, scrapy.Request) and bool(request.meta.get(self.META_KEY))
+
+    def route_outputs(self, outputs):
+        """
+        With a dispatcher, translation requests are downloaded directly rather than returned to the engine
+        """
+        if self.dispatcher is None:
+            return outputs
+        routed_outputs = []
+        for output in outputs:
+            if self.is_translation_request(output):
+                self.dispatcher.send(output)
+            else:
+                routed_outputs.append(output)
+        return routed_outputs
+
+    def send_request(self, request):
+        """
+        Sends a request that isn't part of any spider output
+        """
+        if self.dispatcher is not None and self.is_translation_request(request):
+            self.dispatcher.send(request)
+        else:
+            self.crawler.engine.crawl(request)
+
+    def emit_later(self, outputs):
+        """
+        Sends outputs produced outside of any spider output to the engine. Requests are sent right away, items
+        are handed over by the callback of an output request.
+        """
+        output_request_needed = not self._later_outputs
+        for output in outputs:
+            if isinstance(output, scrapy.Request):
+                self.send_request(output)
+            else:
+                self._later_outputs.append(output)
+        if self._later_outputs and output_request_needed:
+            output_request = scrapy.Request(
+                'data:,', callback=self._later_outputs_callback, dont_filter=True, priority=1000,
+                meta={self.META_KEY: None, 'dont_obey_robotstxt': True},
+            )
+            self.crawler.engine.crawl(output_request)
+
+    def _later_outputs_callback(self, response):
+        outputs, self._later_outputs = self._later_outputs, []
+        return outputs
+
+    def translation_downloaded(self, result, request):
+        """
+        Handles the Response or Failure of a request downloaded by the dispatcher
+        """
+        try:
+            if isinstance(result, Failure):
+                logger.warning("Translation request %s failed: %s", request, result.getErrorMessage())
+                outputs = self.handle_translation_failure(request, result.value)
+            elif result.status<300:
+                outputs = self.handle_translation_response(result)
+            else:
+                outputs = self.handle_translation_failure(
+                    request, excs.TranslationErrorDueToInvalidResponseCode(result)
+                )
+        except excs.TranslationError as e:
+            # FailureAction.RAISE: there's no exception handler on this path
+            logger.error("Translation of %s failed: %s", request, e.details())
+            return
+        self.emit_later(outputs)
+
+    def as_deferred(self, translation):
+        """
+        Wraps the coroutines (async def translators) and other awaitables into Deferreds, other translations are
+        returned as is. The asyncio reactor (TWISTED_REACTOR) is needed to await asyncio code.
+        """
+        if isinstance(translation, defer.Deferred) or not inspect.isawaitable(translation):
+            return translation
+        self.running_awaitables += 1
+        d = deferred_from_coro(translation)
+        d.addBoth(self._awaitable_done)
+        return d
+
+    def _awaitable_done(self, result):
+        self.running_awaitables -= 1
+        # the awaitable completes outside of any spider output
+        return self._flush_soon(result)
+
+    def _flush_soon(self, result):
+        """
+        Sends the outputs of a Deferred fired outside of any spider output once its callbacks ran
+        """
+        from twisted.internet import reactor
+        reactor.callLater(0, self.flush_later)
+        return result
+
+    def flush_later(self):
+        """
+        Sends the outputs of the Deferreds fired outside of any spider output or translation response
+        """
+        try:
+            outputs = self.flush_outputs()
+        except excs.TranslationError as e:
+            logger.error("Translation failed: %s", e.details())
+            return
+        self.emit_later(outputs)
+
+    def _update_inflight_stats(self):
+        if self.crawler is not None:
+            stats = self.crawler.stats
+            stats.set_value('auto_translation/inflight_items', self.inflight_items)
+            stats.max_value('auto_translation/inflight_items_max', self.inflight_items)
+            stats.set_value('auto_translation/inflight_requests', len(self._pending_requests))
+            if self.dispatcher is not None:
+                stats.set_value('auto_translation/queued_requests', len(self.dispatcher))
+
+    def get_request_key(self, request):
+        return (request.method, request.url, request.body)
 
     def translate(self, field_name, item, **kwargs):
         raise NotImplementedError
         
     def process_spider_input(self, response, spider):
-        if self.META_KEY in response.request.meta:
-            if response.status<300:
-                raise excs.TranslationResult(response)
-            raise excs.TranslationErrorDueToInvalidResponseCode(response)
+        """
+        Translation responses are handed to translation_response_received() by the callback of their request,
+        without raising TranslationResult and going through the exception handlers
+        """
 
     def process_spider_exception(self, response, exception, spider):
         if isinstance(exception, excs.TranslationResult):
-            """
-            Don't be confused, it's not an error. Scrapy only allows us to get the translated result 
-            by raising an Exception from process_spider_input()
-            """
-            callback = response.request.meta[self.META_KEY].get('callback')
-            target_field_name = response.request.meta[self.META_KEY]['target_field']
-            item = response.request.meta[self.META_KEY]['item']
-            target_field = item.fields[target_field_name]
-            source_field_name = target_field['source']
-
-            kwargs = target_field.copy()
-            kwargs.pop(self.TAG)
-            if callback:
-                trans_result_callback = callback
-            else:
-                trans_result_callback = self.get_translate_result
+            # raised by the process_spider_input() of subclasses written for the former exception path
+            return self.handle_translation_response(response)
+
+        elif isinstance(exception, excs.TranslationError) and self.is_pending_translation(response.request):
+            return self.handle_translation_failure(response.request, exception)
+
+    def is_pending_translation(self, request):
+        return request.meta.get(self.META_KEY) in self._pending_requests
+
+    def translation_response_received(self, response):
+        """
+        Callback of the translation requests, with handle_httpstatus_all it gets the error responses as well
+        """
+        if response.status<300:
+            return self.handle_translation_response(response)
+        return self.handle_translation_failure(
+            response.request, excs.TranslationErrorDueToInvalidResponseCode(response)
+        )
+
+    def translation_request_failed(self, failure):
+        """
+        Errback of the translation requests: download errors, and the exceptions raised by process_spider_input()
+        """
+        if failure.check(excs.TranslationResult):
+            return self.handle_translation_response(failure.value.response)
+        if not failure.check(excs.TranslationError):
+            logger.warning("Translation request %s failed: %s", failure.request, failure.getErrorMessage())
+        return self.handle_translation_failure(failure.request, failure.value)
+
+    def handle_translation_response(self, response):
+        pending_request = self.pop_translation_request(response.request)
+        if pending_request is None:
+            return []
+        return self.translation_received(pending_request, response) + self.flush_outputs()
+
+    def handle_translation_failure(self, request, exception):
+        pending_request = self.pop_translation_request(request)
+        if pending_request is None:
+            return []
+        self.inc_stats('requests_failed')
+        self.inc_stats('requests_failed/%s'%pending_request.backend)
+        return self.translation_failed(pending_request, exception) + self.flush_outputs()
+
+    def translation_received(self, pending_request, response):
+        outputs = []
+        error = None
+        for state, target_field_name, callback in pending_request.waiters:
+            if state.dropped:
+                continue
+            try:
+                outputs.extend(self.waiter_translation_received(state, target_field_name, callback, response))
+            except excs.TranslationError as e:
+                # FailureAction.RAISE: the other waiters of the request are handled first
+                error = error or e
+        return self.waiters_outputs(outputs, error)
+
+    def waiter_translation_received(self, state, target_field_name, callback, response):
+        item = state.item
+        kwargs = state.plan.fields_by_name[target_field_name].kwargs
+        if callback:
+            trans_result_callback = callback
+        else:
+            trans_result_callback = self.get_translate_result
+        try:
             trans_result = trans_result_callback(response, target_field_name, item, **kwargs)
-            item[target_field_name] = trans_result
-            return [self.handle_untranslated_item(item)]
-
-        elif isinstance(exception, excs.TranslationError):
-            item = response.request.meta[self.META_KEY]['item']
-            target_field_name = response.request.meta[self.META_KEY]['target_field']
-            target_field = item.fields[target_field_name]
-            if target_field.get('on_failure'):
-                action = target_field['on_failure']
-                if action==FailureAction.RAISE:
-                    raise excs.TranslationError
-                elif action==FailureAction.DROP_ITEM:
-                    return None
-                else:
-                    if action==FailureAction.REPORT_IN_FIELD:
-                        item[target_field_name] = self.IN_FIELD_ERROR_MSG
-                    elif action==FailureAction.COPY_SOURCE:
-                        source_field_name = target_field['source']
-                        source_field_value = item[source_field_name]
-                        item[target_field_name] = source_field_value
-                    elif action==FailureAction.SET_NULL:
-                        item[target_field_name] = None
-                    elif action==FailureAction.SET_EMPTY:
-                        item[target_field_name] = ''
-                    else:
-                        raise excs.TranslationErrorGeneral("unknown action: {action}".format(action=action))
-                    trans_result = self.handle_untranslated_item(item)
-                    return [trans_result]
-            else:
-                item[target_field_name] = self.IN_FIELD_ERROR_MSG
-                trans_result = self.handle_untranslated_item(item)
-                return [trans_result]
-                    
+        except Exception as e:
+            # don't let a broken callback take the other waiters down
+            logger.error("Unable to read the translation of field '%s' from %s: %r", target_field_name, response, e)
+            return self.field_translation_failed(state, target_field_name)
+        trans_result = self.as_deferred(trans_result)
+        if isinstance(trans_result, defer.Deferred):
+            trans_result.addCallbacks(
+                self._deferred_field_translated, self._deferred_field_failed,
+                callbackArgs=(state, target_field_name), errbackArgs=(state, target_field_name),
+            )
+        elif self.is_async_translation(trans_result):
+            # the callback needs one more round trip to finish the field
+            request, callback = trans_result
+            request = self.make_translation_request(state, target_field_name, request, callback)
+            if request is not None:
+                return [request]
+        else:
+            return self.field_translated(state, target_field_name, trans_result)
+        return []
+
+    def translation_failed(self, pending_request, exception):
+        outputs = []
+        error = None
+        for state, target_field_name, _ in pending_request.waiters:
+            if state.dropped:
+                continue
+            try:
+                outputs.extend(self.field_translation_failed(state, target_field_name, exception))
+            except excs.TranslationError as e:
+                # FailureAction.RAISE: the other waiters of the request are handled first
+                error = error or e
+        return self.waiters_outputs(outputs, error)
+
+    def waiters_outputs(self, outputs, error):
+        """
+        Returns the outputs of the waiters of a request. When one of them raised a TranslationError, it is raised
+        again once every waiter is handled, and the outputs of the others are sent by flush_later()
+        """
+        if error is None:
+            return outputs
+        self._outbox.extend(outputs)
+        self._flush_soon(None)
+        raise error
+
+    def _deferred_field_translated(self, value, state, field_name):
+        if state.dropped:
+            return
+        if self.is_async_translation(value):
+            request, callback = value
+            request = self.make_translation_request(state, field_name, request, callback)
+            if request is not None:
+                self._outbox.append(request)
+        else:
+            self._outbox.extend(self.field_translated(state, field_name, value))
+
+    def _deferred_field_failed(self, failure, state, field_name):
+        if state.dropped:
+            return
+        if not failure.check(excs.TranslationError):
+            logger.error("Translation of field '%s' failed: %s", field_name, failure.getErrorMessage())
+        try:
+            self._outbox.extend(self.field_translation_failed(state, field_name, failure.value))
+        except excs.TranslationError as e:
+            # re-raised by flush_outputs() so that FailureAction.RAISE still reaches the exception handlers
+            self._outbox_error = e
+
+    def flush_outputs(self):
+        """
+        Returns the items and requests produced by deferred field translations since the last call
+        """
+        outputs, self._outbox = self._outbox, []
+        error, self._outbox_error = self._outbox_error, None
+        if error is not None:
+            # the outputs of the other fields are sent once the error is raised
+            self._outbox = outputs
+            self._flush_soon(None)
+            raise error
+        return outputs
+
+    def field_translated(self, state, field_name, value):
+        """
+        Fills a pending field and carries on with the rest of the item
+        """
+        state.pending.discard(field_name)
+        state.item[field_name] = value
+        return self.handle_untranslated_item(state.item, state)
+
+    def field_translation_failed(self, state, field_name, exception=None):
+        """
+        Applies the field's failure action (REPORT_IN_FIELD by default), unless the field is spooled to be
+        retried later. exception is what made the translation fail, when it's known.
+        """
+        if exception is not None and self.spool_failed_translation(state, field_name, exception):
+            # the other fields carry on meanwhile
+            return self.handle_untranslated_item(state.item, state)
+        item = state.item
+        field_plan = state.plan.fields_by_name[field_name]
+        action = field_plan.on_failure
+        state.failed.add(field_name)
+        self.inc_stats('fields/failed')
+        self.inc_stats('fields/failed/%s'%FAILURE_ACTION_NAMES.get(action, action))
+        if action==FailureAction.RAISE:
+            state.dropped = True
+            self._set_item_inflight(state, False)
+            self.inc_stats('items/dropped')
+            raise excs.TranslationError
+        elif action==FailureAction.DROP_ITEM:
+            state.dropped = True
+            self._set_item_inflight(state, False)
+            self.inc_stats('items/dropped')
+            return []
+        elif action==FailureAction.REPORT_IN_FIELD:
+            value = self.IN_FIELD_ERROR_MSG
+        elif action==FailureAction.COPY_SOURCE:
+            value = item[field_plan.source]
+        elif action==FailureAction.SET_NULL:
+            value = None
+        elif action==FailureAction.SET_EMPTY:
+            value = ''
+        else:
+            raise excs.TranslationErrorGeneral("unknown action: {action}".format(action=action))
+        return self.field_translated(state, field_name, value)
+
+    def spool_failed_translation(self, state, field_name, exception):
+        """
+        Returns whether the failed field is held for a later retry, see LanguageTranslationMiddleware
+        """
+        return False
+
+    def hold_spooled_item(self, state):
+        """
+        Called when an item waits for nothing but its spooled fields
+        """
 
     def get_translate_result(self, response, field_name, item, **kwargs):
         """
@@ -172,6 +895,126 @@ class AutoTranslationMiddlewareBase:
         )
 
 class LanguageTranslationMiddleware(AutoTranslationMiddlewareBase):
+    """
+    Translates a field from the language of its source field to the language of the field.
+    Set AUTO_TRANSLATION_CACHE_SIZE to keep that many translations in an in-memory LRU cache, a cached
+    translation fills the field without any request. AUTO_TRANSLATION_CACHE_MAX_CHARS bounds the characters
+    held by the cache and AUTO_TRANSLATION_CACHE_TTL (in seconds) the age of a cached translation.
+    Set AUTO_TRANSLATION_STORE_PATH to a SQLite file to keep the translations across crawls as well; it is
+    looked up when the in-memory cache misses.
+    With AUTO_TRANSLATION_SEGMENTATION enabled, texts of many sentences are translated sentence by sentence,
+    so that the sentences they have in common are translated (and cached) once.
+    Texts made of the terms of AUTO_TRANSLATION_GLOSSARIES are translated locally, see Glossary.
+    With AUTO_TRANSLATION_PREFILTER enabled, texts that need no translation are copied, see TranslationPrefilter.
+    With AUTO_TRANSLATION_SPOOL_PATH set, fields failing with a temporary error (download errors and the
+    AUTO_TRANSLATION_SPOOL_HTTP_CODES responses) are held in a TranslationSpool. When the spider is idle, at least
+    AUTO_TRANSLATION_SPOOL_RETRY_DELAY seconds after the last failure, they are translated again all at once;
+    a field spooled AUTO_TRANSLATION_SPOOL_RETRIES times gets its failure action.
+    """
+
+    def __init__(self, settings):
+        super(LanguageTranslationMiddleware, self).__init__(settings)
+        self.cache = None
+        if settings.getint('AUTO_TRANSLATION_CACHE_SIZE', 0)>0:
+            self.cache = LRUTranslationCache(
+                max_entries=settings.getint('AUTO_TRANSLATION_CACHE_SIZE'),
+                max_chars=settings.getint('AUTO_TRANSLATION_CACHE_MAX_CHARS', 0) or None,
+                ttl=settings.getfloat('AUTO_TRANSLATION_CACHE_TTL', 0) or None,
+            )
+        self.store = None
+        if settings.get('AUTO_TRANSLATION_STORE_PATH'):
+            self.store = SqliteTranslationStore(
+                settings.get('AUTO_TRANSLATION_STORE_PATH'),
+                flush_interval=settings.getfloat('AUTO_TRANSLATION_STORE_FLUSH_INTERVAL', 1.0),
+                flush_size=settings.getint('AUTO_TRANSLATION_STORE_FLUSH_SIZE', 500),
+            )
+        self.segmentation = settings.getbool('AUTO_TRANSLATION_SEGMENTATION', False)
+        # waiters of the segments whose translation is a Deferred, by (source language, target language, segment)
+        self._inflight_segments = {}
+        # Glossary by (source language, target language)
+        self.glossaries = load_glossaries(
+            settings.getdict('AUTO_TRANSLATION_GLOSSARIES'),
+            ignore_case=settings.getbool('AUTO_TRANSLATION_GLOSSARY_IGNORE_CASE', False),
+        )
+        self.glossary_substitute = settings.getbool('AUTO_TRANSLATION_GLOSSARY_SUBSTITUTE', False)
+        # texts that don't need a translation service, see TranslationPrefilter
+        self.prefilter = None
+        if settings.getbool('AUTO_TRANSLATION_PREFILTER', False):
+            identifier = None
+            if settings.get('AUTO_TRANSLATION_LANGUAGE_IDENTIFIER'):
+                identifier = load_object(settings.get('AUTO_TRANSLATION_LANGUAGE_IDENTIFIER'))()
+            self.prefilter = TranslationPrefilter(
+                identifier,
+                threshold=settings.getfloat('AUTO_TRANSLATION_LANGUAGE_ID_THRESHOLD', 0.9),
+                min_letters=settings.getint('AUTO_TRANSLATION_LANGUAGE_ID_MIN_LETTERS', 20),
+            )
+        # translations shared with the other nodes of the crawl
+        self.cluster = None
+        if settings.get('AUTO_TRANSLATION_CLUSTER_CACHE_URL'):
+            self.cluster = ClusterTranslationCache(
+                settings.get('AUTO_TRANSLATION_CLUSTER_CACHE_URL'),
+                ttl=settings.getfloat('AUTO_TRANSLATION_CLUSTER_CACHE_TTL', 0) or None,
+                lease_ttl=settings.getfloat('AUTO_TRANSLATION_CLUSTER_LEASE_TTL', 30.0),
+                poll_interval=settings.getfloat('AUTO_TRANSLATION_CLUSTER_POLL_INTERVAL', 0.2),
+                max_connections=settings.getint('AUTO_TRANSLATION_CLUSTER_CACHE_CONNECTIONS', 10),
+                retry_after=settings.getfloat('AUTO_TRANSLATION_CLUSTER_RETRY_AFTER', 30.0),
+            )
+        # fields to translate again once the crawl is over
+        self.spool = None
+        self.spool_draining = False
+        self._spool_call = None
+        if settings.get('AUTO_TRANSLATION_SPOOL_PATH'):
+            self.spool = TranslationSpool(settings.get('AUTO_TRANSLATION_SPOOL_PATH'))
+        self.spool_retries = settings.getint('AUTO_TRANSLATION_SPOOL_RETRIES', 2)
+        self.spool_retry_delay = settings.getfloat('AUTO_TRANSLATION_SPOOL_RETRY_DELAY', 10.0)
+        self.spool_http_codes = set(
+            int(code) for code in settings.getlist('AUTO_TRANSLATION_SPOOL_HTTP_CODES', [408, 429, 500, 502, 503, 504])
+        )
+
+    def spider_idle(self, spider):
+        if self.cluster is not None and len(self.cluster):
+            # lookups are waiting for the cluster cache, or for another node's translations
+            raise DontCloseSpider
+        super(LanguageTranslationMiddleware, self).spider_idle(spider)
+        if self._spool_call is not None:
+            raise DontCloseSpider
+        if self.spool is not None and len(self.spool):
+            # everything else is done, the spooled fields are retried together
+            from twisted.internet import reactor
+            delay = max(0, self.spool.last_spooled + self.spool_retry_delay - time.monotonic())
+            self._spool_call = reactor.callLater(delay, self.drain_spool)
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        super(LanguageTranslationMiddleware, self).spider_closed(spider)
+        if self.store is not None:
+            self.store.close()
+        if self.cluster is not None:
+            self.cluster.close()
+        if self.spool is not None:
+            if self._spool_call is not None and self._spool_call.active():
+                self._spool_call.cancel()
+            if self.spool.lost_fields():
+                logger.warning("%d spooled fields were never retried, their items are lost", self.spool.lost_fields())
+            if len(self.spool) - self.spool.lost_fields():
+                logger.warning(
+                    "%d spooled fields were never retried, they are left in %s for the next crawl",
+                    len(self.spool) - self.spool.lost_fields(), self.spool.path,
+                )
+            self.spool.close()
+        if self.crawler is None:
+            return
+        for prefix, cache in (
+            ('cache', self.cache), ('store', self.store), ('cluster', self.cluster), ('spool', self.spool),
+        ):
+            if cache is not None:
+                for name, value in cache.stats().items():
+                    self.crawler.stats.set_value('auto_translation/%s/%s'%(prefix, name), value, spider=spider)
+
+    def build_translation_plan(self, item_cls):
+        plan = super(LanguageTranslationMiddleware, self).build_translation_plan(item_cls)
+        plan.resolve_source_languages(self.get_source_language_code)
+        return plan
 
     def get_source_language_code(self, source_field):
 
@@ -187,11 +1030,260 @@ class LanguageTranslationMiddleware(AutoTranslationMiddlewareBase):
         return 'en'
 
     def translate(self, field_name, item, **kwargs):
-        source_field_name = kwargs['source']
-        target_field_name = field_name
-        source_language = self.get_source_language_code(item.fields[source_field_name])
-        target_field = item.fields[target_field_name]
-        return self.language_translate(source_language, target_field['language'], item[source_field_name])
+        field_plan = self.get_translation_plan(item.__class__).fields_by_name[field_name]
+        source_text = item[field_plan.source]
+        key = (field_plan.source_language, field_plan.language, source_text)
+        if self.segmentation and self.can_translate_segments():
+            segments = self.split_segments(source_text)
+            if len(segments)>1:
+                translation = self.translate_segments(field_plan.source_language, field_plan.language, segments)
+                if translation is not None:
+                    return translation
+        return self.translate_text(key)
+
+    def translate_text(self, key):
+        """
+        Translates a (source language, target language, text) key, with the help of the prefilter, the glossary,
+        the cache and the store
+        """
+        if self.prefilter is not None:
+            reason = self.prefilter.check(key[2], key[0], key[1])
+            if reason is not None:
+                # copied as is, e.g. a number or a text in the target language already
+                self.inc_stats('prefilter/skipped')
+                self.inc_stats('prefilter/skipped/%s'%reason)
+                return key[2]
+        glossary = self.glossaries.get(key[:2])
+        if glossary is not None:
+            translation = glossary.translate(key[2])
+            if translation is not None:
+                self.inc_stats('glossary/hits')
+                return translation
+            if self.glossary_substitute:
+                text, substitutions = glossary.substitute(key[2])
+                if substitutions:
+                    self.inc_stats('glossary/substitutions', substitutions)
+                    key = (key[0], key[1], text)
+        if self.cache is None and self.store is None and self.cluster is None:
+            return self.as_deferred(self.run_language_translate(*key))
+
+        cached_translation = self.get_cached_translation(key)
+        if cached_translation is not None:
+            return cached_translation
+        if self.cluster is not None:
+            d = self.cluster.get(key)
+            d.addCallback(self._cluster_looked_up, key)
+            # the lookup completes outside of any spider output
+            d.addBoth(self._flush_soon)
+            return d
+        return self.cache_translation(key, self.as_deferred(self.run_language_translate(*key)))
+
+    def _cluster_looked_up(self, translation, key):
+        if translation is None:
+            # this node translates the text
+            return self.cache_translation(key, self.as_deferred(self.run_language_translate(*key)))
+        if self.cache is not None:
+            self.cache.set(key, translation)
+        return translation
+
+    def is_temporary_failure(self, exception):
+        """
+        Download errors and the AUTO_TRANSLATION_SPOOL_HTTP_CODES responses may succeed later, a response the
+        middleware can't read won't
+        """
+        if isinstance(exception, excs.TranslationErrorDueToInvalidResponseCode):
+            return exception.response.status in self.spool_http_codes
+        return not isinstance(exception, excs.TranslationError)
+
+    def spool_failed_translation(self, state, field_name, exception):
+        field_plan = state.plan.fields_by_name[field_name]
+        if self.spool is None or field_plan.translate is not None or not self.is_temporary_failure(exception):
+            return False
+        retries = state.retries.get(field_name, 0)
+        if retries>=self.spool_retries:
+            self.spool.give_up()
+            return False
+        state.retries[field_name] = retries + 1
+        state.spooled.add(field_name)
+        self.spool.add()
+        return True
+
+    def hold_spooled_item(self, state):
+        self.spool.hold(state)
+
+    def drain_spool(self):
+        """
+        Translates the spooled fields again. Their texts are batched together (see AsyncAutoTranslationMiddleware),
+        the requests go through the rate limits like any other translation request.
+        """
+        self._spool_call = None
+        states = self.spool.drain()
+        logger.info("Retrying the spooled translations of %d items", len(states))
+        outputs = []
+        self.spool_draining = True
+        try:
+            for state in states:
+                if state.plan is None:
+                    # read back from the spool file
+                    state.plan = self.get_translation_plan(state.item.__class__)
+                state.pending.difference_update(state.spooled)
+                state.spooled.clear()
+                if state.dropped:
+                    continue
+                try:
+                    outputs.extend(self.handle_untranslated_item(state.item, state))
+                except excs.TranslationError as e:
+                    # FailureAction.RAISE: there's no exception handler on this path
+                    logger.error("Translation of %s failed: %s", state.item, e.details())
+            try:
+                outputs.extend(self.flush_outputs())
+            except excs.TranslationError as e:
+                logger.error("Translation failed: %s", e.details())
+        finally:
+            self.spool_draining = False
+        self.emit_later(outputs)
+
+    def split_segments(self, text):
+        """
+        Returns the (segment, separator) pairs of the text, the text is split into sentences by default
+        """
+        return split_segments(text)
+
+    def can_translate_segments(self):
+        """
+        Whether the segments of a text can be translated without a request each; the whole text is translated at
+        once otherwise
+        """
+        return True
+
+    def translate_segments(self, source_lang_code, target_lang_code, segments):
+        """
+        Translates each distinct segment once and joins the translations back in order. Returns None when the
+        segments come back as (request, callback) tuples anyway, the whole text is translated at once then.
+        """
+        translations = {}
+        for segment, _ in segments:
+            if segment and segment not in translations:
+                translations[segment] = self.translate_segment((source_lang_code, target_lang_code, segment))
+        if self.drop_segment_translations(source_lang_code, target_lang_code, translations.items()):
+            return None
+
+        def join(results):
+            results = list(results)
+            if self.drop_segment_translations(source_lang_code, target_lang_code, results):
+                # the cluster cache missed, the whole text needs a request anyway
+                return self.translate_text((source_lang_code, target_lang_code, join_segments(segments)))
+            translations.update(results)
+            return join_segments(
+                (translations[segment] if segment else '', separator) for segment, separator in segments
+            )
+
+        deferreds = [
+            (segment, translation) for segment, translation in translations.items()
+            if isinstance(translation, defer.Deferred)
+        ]
+        if not deferreds:
+            return join({})
+        d = defer.gatherResults([translation for _, translation in deferreds], consumeErrors=True)
+        d.addCallback(lambda results: join(zip([segment for segment, _ in deferreds], results)))
+        d.addErrback(lambda failure: failure.value.subFailure)
+        return d
+
+    def drop_segment_translations(self, source_lang_code, target_lang_code, translations):
+        """
+        Returns whether some of the (segment, translation) pairs are (request, callback) tuples. Their requests
+        are never sent, the cluster leases taken on their segments are given up.
+        """
+        dropped = [segment for segment, translation in translations if self.is_async_translation(translation)]
+        for segment in dropped:
+            self.release_translation((source_lang_code, target_lang_code, segment))
+        return bool(dropped)
+
+    def release_translation(self, key):
+        """
+        Gives up the cluster lease of a key whose translation won't be done, under the key translate_text() took
+        it: the text with the glossary terms substituted
+        """
+        if self.cluster is None:
+            return
+        glossary = self.glossaries.get(key[:2])
+        if glossary is not None and self.glossary_substitute:
+            text, substitutions = glossary.substitute(key[2])
+            if substitutions:
+                key = (key[0], key[1], text)
+        self.cluster.release(key)
+
+    def translate_segment(self, key):
+        """
+        A segment shared by items translated at the same time is only translated once
+        """
+        waiters = self._inflight_segments.get(key)
+        if waiters is not None:
+            d = defer.Deferred()
+            waiters.append(d)
+            return d
+        translation = self.translate_text(key)
+        if isinstance(translation, defer.Deferred):
+            self._inflight_segments[key] = []
+            translation.addBoth(self._segment_translated, key)
+        return translation
+
+    def _segment_translated(self, result, key):
+        for d in self._inflight_segments.pop(key, []):
+            if isinstance(result, Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+        return result
+
+    def get_cached_translation(self, key):
+        """
+        Looks the translation up in the in-memory cache first, then in the persistent store
+        """
+        if self.cache is not None:
+            translation = self.cache.get(key)
+            if translation is not None:
+                return translation
+        if self.store is not None:
+            translation = self.store.get(key)
+            if translation is not None:
+                if self.cache is not None:
+                    self.cache.set(key, translation)
+                return translation
+        return None
+
+    def cache_translation(self, key, translation):
+        """
+        Stores the result of language_translate() in the cache and the store, once it is known,
+        and returns it unchanged
+        """
+        if isinstance(translation, str):
+            if self.cache is not None:
+                self.cache.set(key, translation)
+            if self.store is not None:
+                self.store.set(key, translation)
+            if self.cluster is not None:
+                self.cluster.set(key, translation)
+        elif isinstance(translation, defer.Deferred):
+            translation.addCallbacks(self._cache_deferred_translation, self._deferred_translation_failed,
+                                     callbackArgs=(key,), errbackArgs=(key,))
+        elif self.is_async_translation(translation):
+            request, callback = translation
+            def callback_with_cache(response, field_name, item, **kwargs):
+                return self.cache_translation(key, callback(response, field_name, item, **kwargs))
+            return request, callback_with_cache
+        return translation
+
+    def _cache_deferred_translation(self, translation, key):
+        return self.cache_translation(key, translation)
+
+    def _deferred_translation_failed(self, failure, key):
+        if self.cluster is not None:
+            self.cluster.release(key)
+        return failure
+
+    def run_language_translate(self, source_lang_code, target_lang_code, text):
+        return self.language_translate(source_lang_code, target_lang_code, text)
 
     def language_translate(self, source_lang_code, target_lang_code, text):
         raise NotImplementedError
@@ -200,19 +1292,82 @@ class SyncAutoTranslationMiddleware(LanguageTranslationMiddleware):
     """
     Translate "text" to the language specified by "target_lang_code".
     You need to implement this function only when you choose to go with Synchronous translation.
-    Make sure this function is finished real quickly.
+    Make sure this function is finished real quickly, or set AUTO_TRANSLATION_EXECUTOR to 'thread' or 'process'
+    to have it called in a pool of AUTO_TRANSLATION_EXECUTOR_WORKERS workers.
     """
 
+    def run_language_translate(self, source_lang_code, target_lang_code, text):
+        if self.executor is None or inspect.iscoroutinefunction(self.language_translate):
+            return self.language_translate(source_lang_code, target_lang_code, text)
+        return self.executor.submit_language_translate(self, source_lang_code, target_lang_code, text)
+
     def language_translate(self, source_lang_code, target_lang_code, text):
         return 'Text translated by SyncAutoTranslationMiddleware. If you see this, please rewrite the ' \
                'SyncAutoTranslationMiddleware.translate() method'
 
 class AsyncAutoTranslationMiddleware(LanguageTranslationMiddleware):
+    """
+    Sends a request to a translation service for each text.
+    With AUTO_TRANSLATION_BATCHING enabled, the texts of an item that share the same source and target language
+    are sent in one request instead, see get_batch_translate_url() and get_batch_translate_result().
+    A batch holds at most AUTO_TRANSLATION_BATCH_SIZE texts and AUTO_TRANSLATION_BATCH_MAX_CHARS characters.
+    Set AUTO_TRANSLATION_BATCH_WINDOW (in seconds) to let the texts of many items share a batch as well.
+    """
+
+    def __init__(self, settings):
+        super(AsyncAutoTranslationMiddleware, self).__init__(settings)
+        self.batcher = None
+        self._inflight_texts = {}
+        if settings.getbool('AUTO_TRANSLATION_BATCHING', False):
+            self.batcher = TranslationBatcher(
+                max_texts=settings.getint('AUTO_TRANSLATION_BATCH_SIZE', 128),
+                max_chars=settings.getint('AUTO_TRANSLATION_BATCH_MAX_CHARS', 30000),
+                window=settings.getfloat('AUTO_TRANSLATION_BATCH_WINDOW', 0),
+                on_timeout=self.schedule_batches,
+            )
+        # the texts of the spooled fields are batched even without AUTO_TRANSLATION_BATCHING
+        self.spool_batcher = None
+        if self.spool is not None:
+            self.spool_batcher = TranslationBatcher(
+                max_texts=settings.getint('AUTO_TRANSLATION_BATCH_SIZE', 128),
+                max_chars=settings.getint('AUTO_TRANSLATION_BATCH_MAX_CHARS', 30000),
+            )
+
+    def get_batcher(self):
+        if self.spool_draining:
+            return self.spool_batcher
+        return self.batcher
+
+    def can_translate_segments(self):
+        # without a batcher, every segment would be a request of its own
+        return self.get_batcher() is not None
 
     def language_translate(self, source_lang_code, target_lang_code, text):
+        batcher = self.get_batcher()
+        if batcher is not None:
+            inflight_batch = self._inflight_texts.get((source_lang_code, target_lang_code, text))
+            if inflight_batch is not None:
+                return inflight_batch.add(text)
+            return batcher.add(source_lang_code, target_lang_code, text)
+        return self.get_translate_request(source_lang_code, target_lang_code, text), self.get_translate_result
+
+    def get_translate_request(self, source_lang_code, target_lang_code, text):
+        """
+        Sends the text in the URL by default, see get_translate_url()
+        """
+        return scrapy.Request(
+            url = self.get_translate_url( source_lang_code, target_lang_code, text),
+            meta = {CHARACTERS_META_KEY: len(text)},
+        )
+
+    def get_batch_translate_request(self, source_lang_code, target_lang_code, texts):
+        """
+        Sends the texts in the URL by default, see get_batch_translate_url()
+        """
         return scrapy.Request(
-            url = self.get_translate_url( source_lang_code, target_lang_code, text)
-        ), self.get_translate_result
+            url = self.get_batch_translate_url(source_lang_code, target_lang_code, texts),
+            meta = {CHARACTERS_META_KEY: sum(len(text) for text in texts)},
+        )
 
     def get_translate_url(self, source_lang_code, target_lang_code, text, **kwargs):
         raise NotImplementedError
@@ -220,6 +1375,69 @@ class AsyncAutoTranslationMiddleware(LanguageTranslationMiddleware):
     def get_translate_result(self, response, field_name, item, **kwargs):
         raise NotImplementedError
 
+    def get_batch_translate_url(self, source_lang_code, target_lang_code, texts, **kwargs):
+        raise NotImplementedError
+
+    def get_batch_translate_result(self, response, texts, **kwargs):
+        """
+        Returns the list of translations, in the same order as texts
+        """
+        raise NotImplementedError
+
+    def make_batch_request(self, batch):
+        request = self.get_batch_translate_request(batch.source_lang_code, batch.target_lang_code, batch.texts)
+        self.register_translation_request(request, batch=batch)
+        for text in batch.texts:
+            # from now on the same text is not batched again but waits for this request
+            self._inflight_texts[(batch.source_lang_code, batch.target_lang_code, text)] = batch
+        return request
+
+    def release_batch(self, batch):
+        for text in batch.texts:
+            self._inflight_texts.pop((batch.source_lang_code, batch.target_lang_code, text), None)
+
+    def flush_outputs(self):
+        if self.batcher is not None:
+            # without a window, the batches of an item are sent as soon as the item has been walked through
+            for batch in self.batcher.pop_batches(include_open=not self.batcher.window):
+                self._outbox.append(self.make_batch_request(batch))
+        if self.spool_batcher is not None:
+            for batch in self.spool_batcher.pop_batches(include_open=True):
+                self._outbox.append(self.make_batch_request(batch))
+        return super(AsyncAutoTranslationMiddleware, self).flush_outputs()
+
+    def schedule_batches(self, batches):
+        for batch in batches:
+            self.send_request(self.make_batch_request(batch))
+
+    def spider_idle(self, spider):
+        if self.batcher is not None and self.batcher.has_batches():
+            self.schedule_batches(self.batcher.pop_batches(include_open=True))
+            raise DontCloseSpider
+        super(AsyncAutoTranslationMiddleware, self).spider_idle(spider)
+
+    def translation_received(self, pending_request, response):
+        batch = pending_request.batch
+        if batch is None:
+            return super(AsyncAutoTranslationMiddleware, self).translation_received(pending_request, response)
+        self.release_batch(batch)
+        try:
+            results = self.get_batch_translate_result(response, batch.texts)
+        except Exception as e:
+            logger.error("Unable to read the batch translation response from '%s': %s", response.url, e)
+            batch.fail(excs.TranslationErrorGeneral(str(e)))
+        else:
+            batch.resolve(results)
+        return []
+
+    def translation_failed(self, pending_request, exception):
+        batch = pending_request.batch
+        if batch is None:
+            return super(AsyncAutoTranslationMiddleware, self).translation_failed(pending_request, exception)
+        self.release_batch(batch)
+        batch.fail(exception)
+        return []
+
 class GoogleAutoTranslationMiddleware(AsyncAutoTranslationMiddleware):
     """
     Asynchronous translator using Google Cloud Translation.
@@ -228,27 +1446,51 @@ class GoogleAutoTranslationMiddleware(AsyncAutoTranslationMiddleware):
     If you don't feel comfortable to expose your API key anywhere in the code or settings, 
     you may go with command line option like: 
         scrapy crawl <your-spider-name> -s GOOGLE_CLOUD_API_KEY=<your-google-api-key>
-    
+    Texts are sent in the query string of a GET request, unless the URL would be longer than
+    GOOGLE_TRANSLATION_POST_THRESHOLD characters (2000 by default, 0 to always POST): they are then sent in
+    the JSON body of a POST request, with the API key in a header.
     """
 
     api_key = None
+    TRANSLATE_URL = GOOGLE_TRANSLATE_URL
+
+    def get_translate_request(self, source_lang_code, target_lang_code, text):
+        url = self.get_translate_url(source_lang_code, target_lang_code, text)
+        if self.fits_in_url(url):
+            return scrapy.Request(url=url, meta={CHARACTERS_META_KEY: len(text)})
+        return google_translate_post_request(
+            self.TRANSLATE_URL, self.get_api_key(), source_lang_code, target_lang_code, [text]
+        )
+
+    def get_batch_translate_request(self, source_lang_code, target_lang_code, texts):
+        url = self.get_batch_translate_url(source_lang_code, target_lang_code, texts)
+        if self.fits_in_url(url):
+            return scrapy.Request(url=url, meta={CHARACTERS_META_KEY: sum(len(text) for text in texts)})
+        return google_translate_post_request(
+            self.TRANSLATE_URL, self.get_api_key(), source_lang_code, target_lang_code, texts
+        )
+
+    def fits_in_url(self, url):
+        """
+        Whether a GET request may be sent, see GOOGLE_TRANSLATION_POST_THRESHOLD
+        """
+        threshold = self.settings.getint('GOOGLE_TRANSLATION_POST_THRESHOLD', 2000)
+        return bool(threshold) and len(url)<=threshold
 
     def get_translate_url(self, source_lang_code, target_lang_code, text, **kwargs):
-        quoted_text = urlquote(text.encode('utf8'))
-        key = self.get_api_key()
-        return \
-            'https://translation.googleapis.com/language/translate/v2?key={key}' \
-            '&q={quoted_text}' \
-            '&target={target_lang_code}' \
-            '&source={source_lang_code}'.format(
-                key=key, 
-                quoted_text=quoted_text, 
-                target_lang_code=target_lang_code, 
-                source_lang_code=source_lang_code
-            )
+        return self.get_batch_translate_url(source_lang_code, target_lang_code, [text], **kwargs)
 
     def get_translate_result(self, response, field_name, item, **kwargs):
-        return urlunquote(json.loads(response.text)['data']['translations'][0]['translatedText'])
+        return self.get_batch_translate_result(response, [item[kwargs['source']]])[0]
+
+    def get_batch_translate_url(self, source_lang_code, target_lang_code, texts, **kwargs):
+        """
+        The v2 API accepts many "q" parameters and translates them in one go
+        """
+        return google_translate_url(self.TRANSLATE_URL, self.get_api_key(), source_lang_code, target_lang_code, texts)
+
+    def get_batch_translate_result(self, response, texts, **kwargs):
+        return google_translate_results(response)
 
     def get_api_key(self):
         if hasattr(self, 'api_key') and bool(self.api_key):
@@ -264,3 +1506,132 @@ class GoogleAutoTranslationMiddleware(AsyncAutoTranslationMiddleware):
             + "or specify it as a command line option like this: "
             + "scrapy crawl <your-spider-name> -s GOOGLE_CLOUD_API_KEY=<your-google-cloud-api-key>"
         )
+
+class RoutedAutoTranslationMiddleware(AsyncAutoTranslationMiddleware):
+    """
+    Asynchronous translator using several translation services, configured in AUTO_TRANSLATION_BACKENDS:
+
+        AUTO_TRANSLATION_BACKENDS = {
+            'google': {'class': 'scrapy_auto_trans.backends.GoogleTranslationBackend', 'api_key': '...'},
+            'deepl': {'class': 'scrapy_auto_trans.backends.DeepLTranslationBackend', 'api_key': '...'},
+        }
+
+    Each request goes to the fastest available backend, see TranslationRouter. When it fails, the texts are sent
+    to the next backend; when it's slower than AUTO_TRANSLATION_HEDGE_PERCENTILE of the latencies of its backend,
+    they are sent to another backend as well and the first answer wins. A backend that fails
+    AUTO_TRANSLATION_BACKEND_FAILURES times in a row is set aside for AUTO_TRANSLATION_BACKEND_COOLDOWN seconds.
+    Translation requests are downloaded directly, see TranslationDispatcher.
+    """
+
+    USE_DISPATCHER = True
+
+    def __init__(self, settings):
+        super(RoutedAutoTranslationMiddleware, self).__init__(settings)
+        backends = []
+        for name, options in settings.getdict('AUTO_TRANSLATION_BACKENDS').items():
+            options = dict(options)
+            backend_cls = load_object(options.pop('class'))
+            backends.append(backend_cls(name, settings, **options))
+        if not backends:
+            raise ValueError("AUTO_TRANSLATION_BACKENDS must list at least one translation backend")
+        self.router = TranslationRouter(
+            backends,
+            hedge_percentile=settings.getfloat('AUTO_TRANSLATION_HEDGE_PERCENTILE', 95),
+            min_samples=settings.getint('AUTO_TRANSLATION_HEDGE_MIN_SAMPLES', 20),
+            failure_threshold=settings.getint('AUTO_TRANSLATION_BACKEND_FAILURES', 3),
+            cooldown=settings.getfloat('AUTO_TRANSLATION_BACKEND_COOLDOWN', 30.0),
+        )
+
+    def can_translate_segments(self):
+        # texts are always sent as batches, see language_translate()
+        return True
+
+    def language_translate(self, source_lang_code, target_lang_code, text):
+        if self.get_batcher() is not None:
+            return super(RoutedAutoTranslationMiddleware, self).language_translate(
+                source_lang_code, target_lang_code, text
+            )
+        inflight_batch = self._inflight_texts.get((source_lang_code, target_lang_code, text))
+        if inflight_batch is not None:
+            return inflight_batch.add(text)
+        # without batching, every text is a batch of its own
+        batch = TranslationBatch(source_lang_code, target_lang_code)
+        d = batch.add(text)
+        self._outbox.append(self.make_batch_request(batch))
+        return d
+
+    def make_batch_request(self, batch):
+        for text in batch.texts:
+            self._inflight_texts[(batch.source_lang_code, batch.target_lang_code, text)] = batch
+        return self.make_attempt_request(RoutedTranslation(batch))
+
+    def make_attempt_request(self, routed):
+        """
+        Returns the request of a new attempt to translate the batch, sent to the best backend not tried yet
+        """
+        backend = self.router.choose(exclude=routed.tried, fallback=not routed.tried)
+        batch = routed.batch
+        attempt = RoutedAttempt(routed, backend)
+        request = backend.get_request(batch.source_lang_code, batch.target_lang_code, batch.texts)
+        # a failed request is sent to another backend rather than retried
+        request.meta['dont_retry'] = True
+        self.register_translation_request(request, batch=attempt)
+        routed.tried.append(backend)
+        routed.attempts.add(attempt)
+        if len(routed.tried)==1:
+            delay = self.router.hedge_delay(backend)
+            if delay is not None and self.router.choose(exclude=routed.tried) is not None:
+                from twisted.internet import reactor
+                routed.hedge_call = reactor.callLater(delay, self.hedge, routed)
+        return request
+
+    def hedge(self, routed):
+        routed.hedge_call = None
+        if routed.done:
+            return
+        self.inc_stats('hedged_requests')
+        self.send_request(self.make_attempt_request(routed))
+
+    def finish_routed_translation(self, routed):
+        routed.done = True
+        routed.cancel_hedge()
+        self.release_batch(routed.batch)
+
+    def translation_received(self, pending_request, response):
+        attempt = pending_request.batch
+        if not isinstance(attempt, RoutedAttempt):
+            return super(RoutedAutoTranslationMiddleware, self).translation_received(pending_request, response)
+        routed, backend = attempt.routed, attempt.backend
+        try:
+            results = backend.get_results(response, routed.batch.texts)
+        except Exception as e:
+            logger.error("Unable to read the translations of %r from '%s': %s", backend, response.url, e)
+            return self.translation_failed(pending_request, excs.TranslationErrorGeneral(str(e)))
+        self.router.succeeded(backend, time.monotonic() - attempt.started)
+        routed.attempts.discard(attempt)
+        if routed.done:
+            # the other attempt was faster
+            return []
+        self.inc_stats('backends/%s/wins'%backend.name)
+        self.finish_routed_translation(routed)
+        routed.batch.resolve(results)
+        return []
+
+    def translation_failed(self, pending_request, exception):
+        attempt = pending_request.batch
+        if not isinstance(attempt, RoutedAttempt):
+            return super(RoutedAutoTranslationMiddleware, self).translation_failed(pending_request, exception)
+        routed, backend = attempt.routed, attempt.backend
+        self.router.failed(backend)
+        self.inc_stats('backends/%s/failures'%backend.name)
+        routed.attempts.discard(attempt)
+        if routed.done or routed.attempts:
+            # already translated, or another attempt may still succeed
+            return []
+        if self.router.choose(exclude=routed.tried) is not None:
+            self.inc_stats('failovers')
+            routed.cancel_hedge()
+            return [self.make_attempt_request(routed)]
+        self.finish_routed_translation(routed)
+        routed.batch.fail(exception)
+        return []
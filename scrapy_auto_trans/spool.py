@@ -0,0 +1,129 @@
+"""
+Items whose translation failed with a temporary error, held on disk until they are retried at the end of the crawl
+"""
+import logging
+import os
+import pickle
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+# header of a record: number of spooled fields, size of the pickled item state
+HEADER = struct.Struct('>II')
+
+
+class TranslationSpool:
+    """
+    A queue of item translation states, appended to a file as length-prefixed pickles. A state is held once its
+    item waits for nothing but its spooled fields; it leaves memory then, and is read back by drain().
+    States that can't be pickled (e.g. items of classes that can't be imported) are kept in memory instead.
+
+    The file is not emptied when the spool is opened: the states left by a crawl that stopped before draining
+    them are retried by the next one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        # states that couldn't be pickled
+        self._in_memory = []
+        # spooled fields of the held states
+        self._fields = self._count_fields()
+        self.last_spooled = 0
+        self.spooled = 0
+        self.retried = 0
+        self.failed = 0
+        if self._fields:
+            logger.info("%d fields of a previous crawl are waiting in the spool %s", self._fields, path)
+
+    def __len__(self):
+        return self._fields
+
+    def add(self):
+        """
+        Counts a field spooled for a retry
+        """
+        self.spooled += 1
+        self.last_spooled = time.monotonic()
+
+    def give_up(self):
+        """
+        Counts a field that failed again after its last retry
+        """
+        self.failed += 1
+
+    def hold(self, state):
+        """
+        Writes a state waiting for its spooled fields only
+        """
+        self._fields += len(state.spooled)
+        try:
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug("Keeping the spooled item %s in memory: %s", state.item, e)
+            self._in_memory.append(state)
+            return
+        self._file.write(HEADER.pack(len(state.spooled), len(data)) + data)
+        self._file.flush()
+
+    def drain(self):
+        """
+        Returns the held states, and empties the spool. The states read from the file have no plan.
+        """
+        states, self._in_memory = self._in_memory, []
+        self._file.flush()
+        self._file.seek(0)
+        for data in self._read_records():
+            try:
+                states.append(pickle.loads(data))
+            except Exception as e:
+                logger.error("Unable to read a spooled item from %s: %s", self.path, e)
+        self._file.truncate(0)
+        self._fields = 0
+        self.retried += sum(len(state.spooled) for state in states)
+        return states
+
+    def _read_records(self):
+        while True:
+            header = self._file.read(HEADER.size)
+            if len(header)<HEADER.size:
+                break
+            _, size = HEADER.unpack(header)
+            data = self._file.read(size)
+            if len(data)<size:
+                # written by a crawl that stopped in the middle of it
+                break
+            yield data
+
+    def _count_fields(self):
+        file_size = os.fstat(self._file.fileno()).st_size
+        self._file.seek(0)
+        fields = 0
+        while True:
+            header = self._file.read(HEADER.size)
+            if len(header)<HEADER.size:
+                break
+            count, size = HEADER.unpack(header)
+            if self._file.seek(size, os.SEEK_CUR)>file_size:
+                break
+            fields += count
+        return fields
+
+    def close(self):
+        self._file.close()
+
+    def lost_fields(self):
+        """
+        Spooled fields of the states kept in memory, which the next crawl can't retry
+        """
+        return sum(len(state.spooled) for state in self._in_memory)
+
+    def stats(self):
+        return {
+            'spooled': self.spooled,
+            'retried': self.retried,
+            'failed': self.failed,
+            'left': len(self) - self.lost_fields(),
+            'lost': self.lost_fields(),
+        }
@@ -0,0 +1,49 @@
+"""
+Latency histograms kept in Scrapy's stats collector
+"""
+from . import FailureAction
+
+PREFIX = 'auto_translation/latency/'
+
+FAILURE_ACTION_NAMES = {value: name for name, value in vars(FailureAction).items() if name.isupper()}
+
+# upper bounds of the histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def bucket_name(bound):
+    return 'le_%gs'%bound if bound is not None else 'le_inf'
+
+
+def observe_latency(stats, name, seconds, spider=None):
+    """
+    Counts a latency in the histogram auto_translation/latency/<name>: one counter per bucket, plus the count,
+    the sum and the max of the latencies
+    """
+    prefix = PREFIX + name
+    for bound in LATENCY_BUCKETS:
+        if seconds<=bound:
+            break
+    else:
+        bound = None
+    stats.inc_value('%s/%s'%(prefix, bucket_name(bound)), spider=spider)
+    stats.inc_value(prefix + '/count', spider=spider)
+    stats.inc_value(prefix + '/sum', seconds, start=0.0, spider=spider)
+    stats.max_value(prefix + '/max', seconds, spider=spider)
+
+
+def latency_percentile(stats, name, percentile):
+    """
+    Upper bound of the bucket holding the given percentile (0-100) of the histogram, None if it's empty.
+    stats is the dict returned by the stats collector's get_stats().
+    """
+    prefix = PREFIX + name
+    count = stats.get(prefix + '/count', 0)
+    if not count:
+        return None
+    seen = 0
+    for bound in LATENCY_BUCKETS:
+        seen += stats.get('%s/%s'%(prefix, bucket_name(bound)), 0)
+        if seen * 100>=count * percentile:
+            return bound
+    return stats.get(prefix + '/max')
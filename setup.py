@@ -13,8 +13,17 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/jiansongyang/scrapy-auto-translation-middleware",
     license='MIT',
-    packages=setuptools.find_packages(exclude=('examples',)),
+    packages=setuptools.find_packages(exclude=('examples', 'tests')),
     zip_safe=False,
+    extras_require={
+        'redis': ['redis'],
+        'test': ['pytest', 'fakeredis'],
+    },
+    entry_points={
+        'scrapy.commands': [
+            'translate = scrapy_auto_trans.commands.translate:Command',
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
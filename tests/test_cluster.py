@@ -0,0 +1,162 @@
+import time
+import pytest
+import scrapy
+from scrapy.settings import Settings
+from twisted.internet import defer, threads
+from scrapy_auto_trans.cluster import ClusterTranslationCache
+from scrapy_auto_trans.spidermiddlewares.autotrans import SyncAutoTranslationMiddleware
+
+fakeredis = pytest.importorskip('fakeredis')
+
+KEY = ('en', 'fr', 'Hello')
+
+
+@pytest.fixture(autouse=True)
+def round_trips_in_reactor_thread(monkeypatch):
+    # the round trips run right away instead of in the reactor's thread pool
+    monkeypatch.setattr(threads, 'deferToThread', defer.maybeDeferred)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_cache(server, **kwargs):
+    cache = ClusterTranslationCache('redis://localhost:6379/0', **kwargs)
+    cache.client = fakeredis.FakeRedis(server=server)
+    return cache
+
+
+def results(d):
+    fired = []
+    d.addCallback(fired.append)
+    return fired
+
+
+def test_miss_takes_lease(server):
+    cache = make_cache(server)
+    fired = results(cache.get(KEY))
+    assert fired == []
+    cache.flush()
+    assert fired == [None]
+    assert KEY in cache._leases
+    assert cache.stats()['misses'] == 1
+
+
+def test_other_node_waits_for_translation(server):
+    node1 = make_cache(server)
+    node2 = make_cache(server)
+    first = results(node1.get(KEY))
+    node1.flush()
+    assert first == [None]
+
+    second = results(node2.get(KEY))
+    node2.flush()
+    # the lease is held by node1
+    assert second == []
+    assert len(node2) == 1
+    node2._poll()
+    assert second == []
+
+    node1.set(KEY, 'Bonjour')
+    node1.flush()
+    node2._poll()
+    assert second == ['Bonjour']
+    assert len(node2) == 0
+    assert node1.stats()['published'] == 1
+    assert node2.stats()['waits'] >= 1
+    assert node2.stats()['hits'] == 1
+
+
+def test_same_node_lookups_wait_for_its_lease(server):
+    cache = make_cache(server)
+    first = results(cache.get(KEY))
+    cache.flush()
+    second = results(cache.get(KEY))
+    cache._poll()
+    assert first == [None]
+    assert second == []
+    cache.set(KEY, 'Bonjour')
+    cache.flush()
+    cache._poll()
+    assert second == ['Bonjour']
+
+
+def test_release_lets_other_node_translate(server):
+    node1 = make_cache(server)
+    node2 = make_cache(server)
+    results(node1.get(KEY))
+    node1.flush()
+    waiting = results(node2.get(KEY))
+    node2.flush()
+    assert waiting == []
+
+    node1.release(KEY)
+    node1.flush()
+    assert KEY not in node1._leases
+    node2._poll()
+    assert waiting == [None]
+    assert KEY in node2._leases
+
+
+def test_expired_lease_is_taken_over(server):
+    node1 = make_cache(server, lease_ttl=0.05)
+    node2 = make_cache(server)
+    results(node1.get(KEY))
+    node1.flush()
+    waiting = results(node2.get(KEY))
+    node2.flush()
+    assert waiting == []
+    time.sleep(0.1)
+    node2._poll()
+    assert waiting == [None]
+
+
+def test_unreachable_redis_falls_back_to_local_translation(server):
+    cache = make_cache(server, retry_after=60)
+    server.connected = False
+    fired = results(cache.get(KEY))
+    cache.flush()
+    assert fired == [None]
+    assert not cache.is_available()
+    assert cache.stats()['errors'] == 1
+    # no round trip until retry_after is over
+    assert results(cache.get(KEY)) == [None]
+    cache.set(KEY, 'Bonjour')
+    assert cache._publishes == {}
+
+
+class SegmentMiddleware(SyncAutoTranslationMiddleware):
+    """
+    Translates the cache misses with a (request, callback) tuple
+    """
+
+    def language_translate(self, source_lang_code, target_lang_code, text):
+        return scrapy.Request('https://translate.example.com/'), self.get_translate_result
+
+    def get_translate_result(self, response, field_name, item, **kwargs):
+        return response.text
+
+
+def test_dropped_segment_leases_released(server):
+    mw = SegmentMiddleware(Settings({
+        'AUTO_TRANSLATION_CLUSTER_CACHE_URL': 'redis://localhost:6379/0',
+        'AUTO_TRANSLATION_SEGMENTATION': True,
+    }))
+    mw.cluster.client = fakeredis.FakeRedis(server=server)
+    segment_keys = [('en', 'fr', 'First sentence.'), ('en', 'fr', 'Second one.')]
+    d = mw.translate_segments('en', 'fr', [(key[2], ' ') for key in segment_keys])
+    mw.cluster.flush()
+    # the segments need a request each, the whole text is looked up instead
+    for key in segment_keys:
+        assert key not in mw.cluster._leases
+    mw.cluster.flush()
+    fired = results(d)
+    assert len(fired) == 1 and mw.is_async_translation(fired[0])
+
+    # another node isn't held up by the leases of the segments
+    other = make_cache(server)
+    waiting = results(other.get(segment_keys[0]))
+    other.flush()
+    assert waiting == [None]
@@ -0,0 +1,62 @@
+import pytest
+import scrapy
+from scrapy.settings import Settings
+from scrapy_auto_trans import FailureAction
+from scrapy_auto_trans import exceptions as excs
+from scrapy_auto_trans.spidermiddlewares.autotrans import AsyncAutoTranslationMiddleware
+
+
+class StrictItem(scrapy.Item):
+    name = scrapy.Field()
+    name_fr = scrapy.Field(auto_translate=True, source='name', language='fr', on_failure=FailureAction.RAISE)
+
+
+class LenientItem(scrapy.Item):
+    name = scrapy.Field()
+    name_fr = scrapy.Field(auto_translate=True, source='name', language='fr')
+
+
+class UrlMiddleware(AsyncAutoTranslationMiddleware):
+
+    def get_translate_url(self, source_lang_code, target_lang_code, text, **kwargs):
+        return 'https://translate.example.com/?sl=%s&tl=%s&q=%s'%(source_lang_code, target_lang_code, text)
+
+
+@pytest.fixture
+def mw():
+    mw = UrlMiddleware(Settings())
+    mw.emitted = []
+    mw.emit_later = mw.emitted.extend
+    return mw
+
+
+def test_items_share_request(mw):
+    outputs = list(mw.process_spider_output(None, [LenientItem(name='Paris'), LenientItem(name='Paris')], None))
+    assert len(outputs) == 1
+    assert mw.inflight_items == 2
+
+
+def test_raise_handles_every_waiter(mw):
+    items = [StrictItem(name='Paris'), StrictItem(name='Paris')]
+    requests = list(mw.process_spider_output(None, items, None))
+    assert len(requests) == 1
+    assert mw.inflight_items == 2
+
+    with pytest.raises(excs.TranslationError):
+        mw.handle_translation_failure(requests[0], ConnectionRefusedError())
+    # both items are dropped, neither holds an in-flight slot
+    assert mw.inflight_items == 0
+    assert mw._pending_requests == {}
+
+
+def test_raise_doesnt_lose_other_waiters(mw):
+    items = [StrictItem(name='Paris'), LenientItem(name='Paris')]
+    requests = list(mw.process_spider_output(None, items, None))
+    assert len(requests) == 1
+
+    with pytest.raises(excs.TranslationError):
+        mw.handle_translation_failure(requests[0], ConnectionRefusedError())
+    assert mw.inflight_items == 0
+    # the item of the other waiter is sent once the error is raised
+    mw.flush_later()
+    assert [item['name_fr'] for item in mw.emitted] == [mw.IN_FIELD_ERROR_MSG]
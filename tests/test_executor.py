@@ -0,0 +1,47 @@
+import scrapy
+from scrapy.settings import Settings
+from scrapy_auto_trans.executor import TranslationExecutor
+from scrapy_auto_trans.spidermiddlewares.autotrans import ItemTranslationState, SyncAutoTranslationMiddleware
+
+
+def double(field_name, item, **kwargs):
+    return item[kwargs['source']] * 2
+
+
+def multiply(factor):
+    def translate(field_name, item, **kwargs):
+        return item[kwargs['source']] * factor
+    return translate
+
+
+class NumberItem(scrapy.Item):
+    number = scrapy.Field()
+    tripled = scrapy.Field(auto_translate=True, source='number', translate=multiply(3))
+
+
+def test_process_pool_submits_picklable_translators():
+    executor = TranslationExecutor('process')
+    try:
+        assert executor.can_submit(double)
+        assert not executor.can_submit(multiply(3))
+    finally:
+        executor.shutdown()
+
+
+def test_thread_pool_submits_any_translator():
+    executor = TranslationExecutor('thread')
+    try:
+        assert executor.can_submit(multiply(3))
+    finally:
+        executor.shutdown()
+
+
+def test_unpicklable_translator_runs_inline():
+    mw = SyncAutoTranslationMiddleware(Settings({'AUTO_TRANSLATION_EXECUTOR': 'process'}))
+    try:
+        item = NumberItem(number=2)
+        state = ItemTranslationState(item, mw.get_translation_plan(NumberItem))
+        assert mw.run_translator(state, state.plan.fields_by_name['tripled']) == 6
+        assert len(mw.executor) == 0
+    finally:
+        mw.executor.shutdown()
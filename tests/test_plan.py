@@ -0,0 +1,82 @@
+import pytest
+import scrapy
+from scrapy_auto_trans.plan import TranslationPlan
+
+
+def test_fields_sorted_by_dependency():
+
+    class Item(scrapy.Item):
+        name = scrapy.Field()
+        name_fr_en = scrapy.Field(auto_translate=True, source='name_fr', language='en')
+        name_fr = scrapy.Field(auto_translate=True, source='name', language='fr')
+        name_de = scrapy.Field(auto_translate=True, source='name', language='de')
+
+    plan = TranslationPlan(Item, 'auto_translate')
+    layers = [[field_plan.name for field_plan in layer] for layer in plan.layers]
+    assert layers == [['name_de', 'name_fr'], ['name_fr_en']]
+    assert [field_plan.name for field_plan in plan.fields] == ['name_de', 'name_fr', 'name_fr_en']
+    assert plan.dependencies == {'name_de': (), 'name_fr': (), 'name_fr_en': ('name_fr',)}
+
+
+def test_untranslated_sources_are_not_dependencies():
+
+    class Item(scrapy.Item):
+        name = scrapy.Field()
+        name_fr = scrapy.Field(auto_translate=True, source='name', language='fr')
+        other = scrapy.Field(auto_translate=False, source='name_fr')
+
+    plan = TranslationPlan(Item, 'auto_translate')
+    assert [field_plan.name for field_plan in plan.fields] == ['name_fr']
+    assert plan.dependencies == {'name_fr': ()}
+
+
+def test_chain_of_dependencies():
+
+    class Item(scrapy.Item):
+        name = scrapy.Field()
+        c = scrapy.Field(auto_translate=True, source='b', language='ja')
+        b = scrapy.Field(auto_translate=True, source='a', language='de')
+        a = scrapy.Field(auto_translate=True, source='name', language='fr')
+
+    plan = TranslationPlan(Item, 'auto_translate')
+    assert [[field_plan.name for field_plan in layer] for layer in plan.layers] == [['a'], ['b'], ['c']]
+
+
+def test_circular_dependency_rejected():
+
+    class Item(scrapy.Item):
+        name = scrapy.Field()
+        name_fr = scrapy.Field(auto_translate=True, source='name', language='fr')
+        a = scrapy.Field(auto_translate=True, source='c', language='fr')
+        b = scrapy.Field(auto_translate=True, source='a', language='de')
+        c = scrapy.Field(auto_translate=True, source='b', language='ja')
+
+    with pytest.raises(ValueError) as e:
+        TranslationPlan(Item, 'auto_translate')
+    assert 'Item' in str(e.value)
+    assert 'a -> c -> b -> a' in str(e.value)
+
+
+def test_self_dependency_rejected():
+
+    class Item(scrapy.Item):
+        name = scrapy.Field(auto_translate=True, source='name', language='fr')
+
+    with pytest.raises(ValueError) as e:
+        TranslationPlan(Item, 'auto_translate')
+    assert 'name -> name' in str(e.value)
+
+
+def test_incremental_by_default_for_language_fields_only():
+
+    class Item(scrapy.Item):
+        name = scrapy.Field()
+        name_fr = scrapy.Field(auto_translate=True, source='name', language='fr')
+        name_de = scrapy.Field(auto_translate=True, source='name', language='de', incremental=False)
+        name_length = scrapy.Field(auto_translate=True, source='name', translate=len)
+        name_upper = scrapy.Field(auto_translate=True, source='name', translate=str.upper, incremental=True)
+
+    plan = TranslationPlan(Item, 'auto_translate')
+    assert {field_plan.name: field_plan.incremental for field_plan in plan.fields} == {
+        'name_fr': True, 'name_de': False, 'name_length': False, 'name_upper': True,
+    }
@@ -0,0 +1,48 @@
+import pytest
+from scrapy_auto_trans.prefilter import TranslationPrefilter
+
+
+@pytest.fixture
+def prefilter():
+    return TranslationPrefilter()
+
+
+@pytest.mark.parametrize('text, reason', [
+    ('  ', 'empty'),
+    ('1,024.5', 'no_letters'),
+    ('https://example.com/a', 'url'),
+    ('contact@example.com', 'email'),
+    ('A320', 'code'),
+    ('SKU-1234', 'code'),
+    ('5km', None),
+    ('3rd', None),
+    ('Paris', None),
+])
+def test_untranslatable_texts(prefilter, text, reason):
+    assert prefilter.check(text, 'en', 'fr') == reason
+
+
+def test_target_script(prefilter):
+    assert prefilter.check('とうきょう', 'en', 'ja') == 'target_script'
+    assert prefilter.check('서울', 'en', 'ko') == 'target_script'
+    assert prefilter.check('Αθήνα', 'en', 'el') == 'target_script'
+    assert prefilter.check('Tokyo', 'en', 'ja') is None
+
+
+@pytest.mark.parametrize('text, target', [
+    ('广州', 'zh-TW'),
+    ('東京', 'zh-CN'),
+    ('東京', 'zh_tw'),
+])
+def test_chinese_variants_translated(prefilter, text, target):
+    assert prefilter.check(text, 'en', target) is None
+
+
+def test_chinese_without_variant(prefilter):
+    assert prefilter.check('广州', 'en', 'zh') == 'target_script'
+
+
+def test_shared_scripts_translated(prefilter):
+    assert prefilter.check('東京', 'ja', 'zh') is None
+    assert prefilter.check('广州', 'zh-CN', 'zh-TW') is None
+    assert prefilter.check('广州', 'zh-TW', 'zh-TW') == 'same_language'
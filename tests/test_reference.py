@@ -0,0 +1,111 @@
+import json
+import scrapy
+from scrapy.http import TextResponse
+from scrapy.settings import Settings
+from twisted.internet import defer
+from scrapy_auto_trans.reference import ReferenceData, uses_reference
+from scrapy_auto_trans.spidermiddlewares.autotrans import SyncAutoTranslationMiddleware
+
+USD_RATES = ReferenceData('https://rates.example.com/usd.json', lambda response: json.loads(response.text))
+
+
+@uses_reference(USD_RATES)
+def usd2eur(field_name, item, reference, **kwargs):
+    return '%.2f'%(float(item[kwargs['source']])*reference['EUR'])
+
+
+class PriceItem(scrapy.Item):
+    price = scrapy.Field()
+    price_eur = scrapy.Field(auto_translate=True, source='price', translate=usd2eur)
+
+
+class Engine:
+    """
+    Downloads nothing: the test fires the Deferreds of the requests
+    """
+
+    def __init__(self):
+        self.paused = False
+        self.downloads = []
+
+    def download(self, request):
+        d = defer.Deferred()
+        self.downloads.append((request, d))
+        return d
+
+    def crawl(self, request):
+        # scheduled requests aren't downloaded while the engine is paused
+        assert not self.paused
+
+    def pause(self):
+        self.paused = True
+
+    def unpause(self):
+        self.paused = False
+
+
+class Stats:
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        pass
+
+    def set_value(self, key, value, spider=None):
+        pass
+
+    def max_value(self, key, value, spider=None):
+        pass
+
+
+class Crawler:
+
+    def __init__(self):
+        self.engine = Engine()
+        self.stats = Stats()
+
+
+def make_middleware(**settings):
+    mw = SyncAutoTranslationMiddleware(Settings(settings))
+    mw.crawler = Crawler()
+    mw.emitted = []
+    mw.emit_later = mw.emitted.extend
+    return mw
+
+
+def rates_response(request, body):
+    return TextResponse(request.url, body=body.encode('utf8'), request=request)
+
+
+def test_single_load_under_backpressure():
+    mw = make_middleware(AUTO_TRANSLATION_MAX_INFLIGHT_ITEMS=2)
+    items = [PriceItem(price=price) for price in ('1', '2', '3')]
+    assert list(mw.process_spider_output(None, items, None)) == []
+    # the items waiting for the reference paused the engine, its request is downloaded all the same
+    assert mw.crawler.engine.paused
+    assert len(mw.crawler.engine.downloads) == 1
+    assert len(mw.references) == 3
+
+    request, d = mw.crawler.engine.downloads[0]
+    d.callback(rates_response(request, '{"EUR": 0.5}'))
+    assert [item['price_eur'] for item in mw.emitted] == ['0.50', '1.00', '1.50']
+    assert not mw.crawler.engine.paused
+    assert mw.inflight_items == 0
+    assert len(mw.references) == 0
+
+    # loaded once for the whole ttl
+    outputs = list(mw.process_spider_output(None, [PriceItem(price='4')], None))
+    assert [item['price_eur'] for item in outputs] == ['2.00']
+    assert len(mw.crawler.engine.downloads) == 1
+    assert mw.references.stats() == {'loads': 1, 'hits': 1, 'waits': 3, 'errors': 0}
+
+
+def test_failed_load_fails_waiting_fields_then_reloads():
+    mw = make_middleware()
+    assert list(mw.process_spider_output(None, [PriceItem(price='1')], None)) == []
+    request, d = mw.crawler.engine.downloads[0]
+    d.callback(rates_response(request, 'not json'))
+    assert [item['price_eur'] for item in mw.emitted] == [mw.IN_FIELD_ERROR_MSG]
+    assert len(mw.references) == 0
+
+    assert list(mw.process_spider_output(None, [PriceItem(price='1')], None)) == []
+    assert len(mw.crawler.engine.downloads) == 2
+    assert mw.references.stats()['errors'] == 1
@@ -0,0 +1,118 @@
+import os
+import pytest
+import scrapy
+from scrapy.settings import Settings
+from twisted.internet import defer
+from scrapy_auto_trans import exceptions as excs
+from scrapy_auto_trans.spidermiddlewares.autotrans import SyncAutoTranslationMiddleware
+
+
+class CityItem(scrapy.Item):
+    name = scrapy.Field()
+    name_fr = scrapy.Field(auto_translate=True, source='name', language='fr')
+    name_de = scrapy.Field(auto_translate=True, source='name', language='de')
+
+
+class FlakyMiddleware(SyncAutoTranslationMiddleware):
+    """
+    Fails with a download error while the translation service is down for the target languages in `down`
+    """
+
+    down = ('fr',)
+    error = ConnectionRefusedError
+
+    def language_translate(self, source_lang_code, target_lang_code, text):
+        if target_lang_code in self.down:
+            return defer.fail(self.error())
+        return '%s (%s)'%(text, target_lang_code)
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / 'spool.bin')
+
+
+def make_middleware(spool_path):
+    mw = FlakyMiddleware(Settings({'AUTO_TRANSLATION_SPOOL_PATH': spool_path}))
+    mw.emitted = []
+    mw.emit_later = mw.emitted.extend
+    return mw
+
+
+@pytest.fixture
+def mw(spool_path):
+    mw = make_middleware(spool_path)
+    yield mw
+    mw.spool.close()
+
+
+def test_failed_field_spooled_then_translated(mw, spool_path):
+    outputs = list(mw.process_spider_output(None, [CityItem(name='Paris')], None))
+    assert outputs == []
+    assert len(mw.spool) == 1
+    # the item waits in the file, not in memory
+    assert os.path.getsize(spool_path) > 0
+    assert mw.spool.lost_fields() == 0
+    # an item waiting for the spool only doesn't hold the engine back
+    assert mw.inflight_items == 0
+
+    mw.down = ()
+    mw.drain_spool()
+    assert [dict(item) for item in mw.emitted] == [{'name': 'Paris', 'name_fr': 'Paris (fr)', 'name_de': 'Paris (de)'}]
+    assert len(mw.spool) == 0
+    assert os.path.getsize(spool_path) == 0
+    assert mw.spool.stats() == {'spooled': 1, 'retried': 1, 'failed': 0, 'left': 0, 'lost': 0}
+
+
+def test_items_drained_together(mw):
+    items = [CityItem(name='Paris'), CityItem(name='Paris'), CityItem(name='Lyon')]
+    assert list(mw.process_spider_output(None, items, None)) == []
+    assert len(mw.spool) == 3
+
+    mw.down = ()
+    mw.drain_spool()
+    assert [item['name_fr'] for item in mw.emitted] == ['Paris (fr)', 'Paris (fr)', 'Lyon (fr)']
+
+
+def test_failure_action_after_last_retry(mw):
+    assert list(mw.process_spider_output(None, [CityItem(name='Paris')], None)) == []
+    mw.drain_spool()
+    assert mw.emitted == []
+    assert len(mw.spool) == 1
+    mw.drain_spool()
+    assert [(item['name_fr'], item['name_de']) for item in mw.emitted] == [(mw.IN_FIELD_ERROR_MSG, 'Paris (de)')]
+    assert len(mw.spool) == 0
+    assert mw.spool.stats() == {'spooled': 2, 'retried': 2, 'failed': 1, 'left': 0, 'lost': 0}
+
+
+def test_permanent_failure_not_spooled(mw):
+    mw.error = lambda: excs.TranslationErrorGeneral('unreadable response')
+    outputs = list(mw.process_spider_output(None, [CityItem(name='Paris')], None))
+    assert [item['name_fr'] for item in outputs] == [mw.IN_FIELD_ERROR_MSG]
+    assert len(mw.spool) == 0
+
+
+def test_next_crawl_retries_items_left_in_spool(spool_path):
+    mw = make_middleware(spool_path)
+    assert list(mw.process_spider_output(None, [CityItem(name='Paris')], None)) == []
+    mw.spider_closed(None)
+    assert mw.spool.stats()['left'] == 1
+
+    # the file isn't emptied when the next crawl opens it
+    mw = make_middleware(spool_path)
+    assert len(mw.spool) == 1
+    mw.down = ()
+    mw.drain_spool()
+    assert [dict(item) for item in mw.emitted] == [{'name': 'Paris', 'name_fr': 'Paris (fr)', 'name_de': 'Paris (de)'}]
+    mw.spool.close()
+
+
+def test_unpicklable_items_kept_in_memory(mw, spool_path):
+    LocalItem = type('LocalItem', (CityItem,), {})
+    assert list(mw.process_spider_output(None, [LocalItem(name='Paris')], None)) == []
+    assert os.path.getsize(spool_path) == 0
+    assert mw.spool.lost_fields() == 1
+
+    mw.down = ()
+    mw.drain_spool()
+    assert [item['name_fr'] for item in mw.emitted] == ['Paris (fr)']
@@ -0,0 +1,48 @@
+from scrapy_auto_trans.cache import SqliteTranslationStore
+from scrapy_auto_trans.fingerprints import FingerprintIndex
+
+KEY = ('en', 'fr', 'Hello')
+
+
+def test_store_survives_reopening(tmp_path):
+    path = str(tmp_path / 'store.db')
+    store = SqliteTranslationStore(path)
+    assert store.get(KEY) is None
+    store.set(KEY, 'Bonjour')
+    # pending rows are read before they're written
+    assert store.get(KEY) == 'Bonjour'
+    store.close()
+    assert store.stats() == {'hits': 1, 'misses': 1, 'writes': 1}
+
+    store = SqliteTranslationStore(path)
+    assert store.get(KEY) == 'Bonjour'
+    store.close()
+
+
+def test_store_writes_when_flush_size_is_reached(tmp_path):
+    store = SqliteTranslationStore(str(tmp_path / 'store.db'), flush_interval=60, flush_size=2)
+    store.set(KEY, 'Bonjour')
+    store.set(('en', 'fr', 'Goodbye'), 'Au revoir')
+    store._writer.join(0.5)
+    assert store.writes == 2
+    store.close()
+
+
+def test_fingerprints_match_source(tmp_path):
+    path = str(tmp_path / 'fingerprints.db')
+    index = FingerprintIndex(path)
+    index.set(('city-1', 'name_fr'), 'Paris', 'Paris (fr)')
+    index.close()
+
+    index = FingerprintIndex(path)
+    assert index.get(('city-1', 'name_fr'), 'Paris') == 'Paris (fr)'
+    assert index.get(('city-1', 'name_fr'), 'Lyon') is None
+    assert index.get(('city-2', 'name_fr'), 'Paris') is None
+    index.close()
+    assert index.stats() == {'hits': 1, 'misses': 2, 'writes': 0}
+
+
+def test_fingerprints_unused_file_not_created(tmp_path):
+    path = tmp_path / 'fingerprints.db'
+    FingerprintIndex(str(path)).close()
+    assert not path.exists()